@@ -0,0 +1,78 @@
+"""检查 hch 的启动耗时与导入的依赖
+
+每条命令运行多次取最短耗时，与预算比较；同时检查命令运行期间没有导入不需要的重型依赖。
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 7
+CHECKS = [
+    # (命令参数, 预期退出码, 耗时预算（毫秒）, 不应导入的模块)
+    (["--help"], 0, 400, ["httpx", "pydantic", "Crypto", "selectolax"]),
+    (["set", "wait-time", "2"], 0, 450, ["httpx", "Crypto", "selectolax"]),
+    # 空档案没有待抢课程，正常退出码为 1
+    (["hunt", "--now"], 1, 650, ["Crypto", "selectolax"]),
+]
+CODE = """
+import atexit
+import sys
+
+atexit.register(lambda: print(",".join(sorted({m.split(".")[0] for m in sys.modules}))))
+sys.argv[0] = "hch"
+from hch.main import app
+
+app()
+"""
+
+
+def main() -> int:
+    failed = False
+    with tempfile.TemporaryDirectory() as app_dir:
+        env = dict(os.environ, XDG_CONFIG_HOME=app_dir)
+        for args, returncode, budget, forbidden in CHECKS:
+            elapsed = []
+            crashed = None
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-c", CODE, *args],
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                )
+                elapsed.append((time.perf_counter() - start) * 1000)
+                # 退出码不符或有未捕获的异常时，耗时与导入检查都没有意义
+                if result.returncode != returncode or "Traceback" in result.stderr:
+                    crashed = result
+                    break
+
+            if crashed is not None:
+                failed = True
+                print(
+                    f"FAIL hch {' '.join(args)}: exited with {crashed.returncode} "
+                    f"(expected {returncode})"
+                )
+                # hch 的错误信息输出到标准输出（最后一行是导入的模块），异常堆栈输出到标准错误
+                print("".join(crashed.stdout.splitlines(keepends=True)[:-1]), end="")
+                print(crashed.stderr, end="", file=sys.stderr)
+                continue
+
+            modules = set(result.stdout.strip().splitlines()[-1].split(","))
+            imported = sorted(set(forbidden) & modules)
+            best = min(elapsed)
+            ok = best <= budget and not imported
+            failed |= not ok
+            print(
+                f"{'ok' if ok else 'FAIL':4} hch {' '.join(args)}: "
+                f"{best:.0f} ms (budget {budget} ms)"
+                + (f", imported {', '.join(imported)}" if imported else "")
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
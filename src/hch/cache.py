@@ -0,0 +1,179 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Generator, Iterator, TypeVar
+
+import typer
+from pydantic import TypeAdapter
+
+from .console import console
+from .error import BaseHunterError, CookieExpiredError
+from .profiler import span
+from .store import get_store
+
+T = TypeVar("T")
+
+app = typer.Typer(name="cache", help="管理缓存")
+
+
+class Cache:
+    """本地缓存
+
+    保存在档案状态库的 cache 表中，记录写入时间与 JSON 内容。
+    未过期的缓存直接使用；服务器出错时回退到已过期的缓存。
+    """
+
+    def __init__(self, ttl: int, app_dir: Path | None = None) -> None:
+        self.ttl = ttl
+        self.store = get_store(app_dir)
+
+    def get(self, key: str, allow_expired: bool = False) -> Any | None:
+        """读取缓存
+
+        Args:
+            key (str)
+            allow_expired (bool): 是否返回已过期的缓存
+
+        Returns:
+            Any | None: 缓存内容，不存在或已过期时返回 None
+        """
+        rows = self.store.query("SELECT time, value FROM cache WHERE key = ?", (key,))
+        if not rows:
+            return None
+        if not allow_expired and time.time() - rows[0]["time"] > self.ttl:
+            return None
+        return json.loads(rows[0]["value"])
+
+    def set(self, key: str, value: Any) -> None:
+        with self.store.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, time, value) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(value, ensure_ascii=False)),
+            )
+
+    def items(self, prefix: str = "") -> list[tuple[str, Any]]:
+        """按写入时间顺序列出键以 prefix 开头的所有缓存，包括已过期的缓存"""
+        rows = self.store.query(
+            "SELECT key, value FROM cache WHERE substr(key, 1, ?) = ? ORDER BY time",
+            (len(prefix), prefix),
+        )
+        return [(row["key"], json.loads(row["value"])) for row in rows]
+
+    def invalidate(self, prefix: str = "") -> int:
+        """删除键以 prefix 开头的所有缓存
+
+        Returns:
+            int: 删除的缓存数量
+        """
+        with self.store.transaction() as connection:
+            return connection.execute(
+                "DELETE FROM cache WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).rowcount
+
+    def fetch(self, key: str, fetch: Callable[[], T], adapter: TypeAdapter[T]) -> T:
+        """优先使用未过期的缓存，否则调用 fetch 获取并写入缓存
+
+        fetch 因服务器错误失败时回退到已过期的缓存；Cookie 失效时直接抛出。
+
+        Args:
+            key (str)
+            fetch (Callable[[], T]): 从服务器获取数据的函数
+            adapter (TypeAdapter[T]): 用于序列化与校验缓存内容
+
+        Returns:
+            T
+        """
+        value = self.get(key)
+        if value is not None:
+            with span("cache hit", "validate", key=key):
+                return adapter.validate_python(value)
+
+        try:
+            result = fetch()
+        except CookieExpiredError:
+            raise
+        except BaseHunterError as e:
+            value = self.get(key, allow_expired=True)
+            if value is None:
+                raise
+            console.print(f"{e}")
+            console.print("[yellow]服务器请求失败，使用已过期的缓存")
+            return adapter.validate_python(value)
+
+        self.set(key, adapter.dump_python(result, mode="json"))
+        return result
+
+    def stream(
+        self,
+        key: str,
+        fetch: Callable[[], Iterator[T]],
+        adapter: TypeAdapter[T],
+    ) -> Generator[T, None, None]:
+        """与 fetch 相同，但逐个产出元素，无需等待全部获取完成
+
+        每个元素产出前先序列化，只有完整获取后才写入缓存；
+        尚未产出任何元素时服务器出错才回退到已过期的缓存。
+        为了写入缓存，整个结果序列化后的 JSON 仍会保留到获取完成，
+        内存占用与结果大小成正比，但不会同时保留元素对象与其副本。
+
+        Args:
+            key (str)
+            fetch (Callable[[], Iterator[T]]): 从服务器逐个获取元素的函数
+            adapter (TypeAdapter[T]): 用于序列化与校验单个元素
+
+        Yields:
+            T
+        """
+        value = self.get(key)
+        if value is not None:
+            with span("cache hit", "validate", key=key):
+                for element in value:
+                    yield adapter.validate_python(element)
+            return
+
+        values = []
+        try:
+            for item in fetch():
+                # 在调用方修改元素之前序列化，缓存的是服务器返回的内容
+                values.append(adapter.dump_python(item, mode="json"))
+                yield item
+        except CookieExpiredError:
+            raise
+        except BaseHunterError as e:
+            value = self.get(key, allow_expired=True)
+            if value is None or values:
+                raise
+            console.print(f"{e}")
+            console.print("[yellow]服务器请求失败，使用已过期的缓存")
+            for element in value:
+                yield adapter.validate_python(element)
+            return
+
+        self.set(key, values)
+
+
+def course_key(academic_year: str, term: str, code: str, keyword: str) -> str:
+    return f"courses/{academic_year}/{term}/{code}/{keyword}"
+
+
+def category_key(academic_year: str, term: str) -> str:
+    return f"categories/{academic_year}/{term}"
+
+
+TIME_INFO_KEY = "time_info"
+GRADES_KEY = "grades"
+
+
+@app.callback()
+def main() -> None:
+    pass
+
+
+@app.command()
+def clear() -> None:
+    """
+    清空缓存
+    """
+    count = Cache(ttl=0).invalidate()
+    console.print(f"[green]已清除 [white]{count} [green]条缓存")
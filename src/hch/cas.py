@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+
+from .paths import get_app_dir
+
+
+def get_cas_cookies_path(app_dir: Path | None = None) -> Path:
+    if app_dir is None:
+        app_dir = get_app_dir()
+    return app_dir / "cas_cookies.json"
+
+
+def load_cas_cookies(path: str | Path | None = None) -> list[dict[str, str]]:
+    """读取保存的统一身份认证 Cookie
+
+    Returns:
+        list[dict[str, str]]: 每个元素包含 name、value、domain 与 path，文件不存在或损坏时为空
+    """
+    if path is None:
+        path = get_cas_cookies_path()
+    try:
+        with open(path, "r") as f:
+            cookies = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return cookies if type(cookies) is list else []
+
+
+def save_cas_cookies(
+    cookies: list[dict[str, str]], path: str | Path | None = None
+) -> None:
+    """保存统一身份认证 Cookie
+
+    其中包含可免密登录的 CASTGC，文件权限设为仅当前用户可读写。
+    """
+    if path is None:
+        path = get_cas_cookies_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(cookies, f)
+    # 文件已存在时 os.open 不会修改权限
+    os.chmod(path, 0o600)
+
+
+def clear_cas_cookies(path: str | Path | None = None) -> None:
+    """删除保存的统一身份认证 Cookie，更换账号时调用"""
+    if path is None:
+        path = get_cas_cookies_path()
+    Path(path).unlink(missing_ok=True)
@@ -0,0 +1,437 @@
+import asyncio
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Self
+
+import typer
+from pydantic import ValidationError
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
+from typing_extensions import Annotated
+
+from .client import AsyncJwClient, JwClient
+from .config import Config, load_config
+from .console import console
+from .course import Course, dump_course_json, load_courses_json, record_seats
+from .error import (
+    CookieExpiredError,
+    GetCourseCategoryError,
+    GetCourseError,
+    GetTimeInfoError,
+    LoadCatalogError,
+    LoadCourseError,
+    MaxRetriesError,
+)
+from .select import filter_courses
+from .store import Store, get_store
+from .spinning import check_cookies, get_cookies, get_course_categories, get_time_info
+from .time_info import TimeInfo
+from .tools import InformationParser, get_courses_async
+
+TOKEN_PATTERN = re.compile(r"[㐀-鿿]+|[a-z0-9]+")
+CJK_PATTERN = re.compile(r"[㐀-鿿]")
+
+retries = 0
+app = typer.Typer(name="catalog", help="离线课程目录")
+
+
+def tokenize(text: str) -> set[str]:
+    """将文本切分为索引词
+
+    中文按单字与相邻两字切分，英文与数字按整词切分，均转为小写。
+    """
+    tokens: set[str] = set()
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if CJK_PATTERN.match(word):
+            tokens.update(word)
+            tokens.update(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.add(word)
+    return tokens
+
+
+def query_tokens(term: str) -> list[str]:
+    """将搜索词切分为查询用的索引词
+
+    中文只使用相邻两字，单字词才使用单字，以减少候选课程数量。
+    """
+    tokens: list[str] = []
+    for word in TOKEN_PATTERN.findall(term.lower()):
+        if CJK_PATTERN.match(word) and len(word) > 1:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class Catalog:
+    """某一学期的全部课程及其倒排索引
+
+    课程与索引词保存在档案状态库中，搜索时只读取命中索引的课程。
+    """
+
+    def __init__(
+        self, store: Store, academic_year: str, term: str, synced_time: str
+    ) -> None:
+        self.store = store
+        self.academic_year = academic_year
+        self.term = term
+        self.synced_time = synced_time
+
+    @classmethod
+    def save(
+        cls,
+        time_info: TimeInfo,
+        courses: list[Course],
+        parser: InformationParser,
+        app_dir: Path | None = None,
+    ) -> Self:
+        """替换该学期的课程目录，并记录一次全部课程的余量"""
+        store = get_store(app_dir)
+        key = (time_info.academic_year, time_info.term)
+        synced_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with store.transaction() as connection:
+            for table in ("catalog_course", "catalog_token"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE academic_year = ? AND term = ?", key
+                )
+            connection.executemany(
+                "INSERT INTO catalog_course "
+                "(academic_year, term, id, position, code, information_hash, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        *key,
+                        course.id,
+                        i,
+                        course.code,
+                        parser.entries[course.id][0]
+                        if course.id in parser.entries
+                        else None,
+                        dump_course_json(course),
+                    )
+                    for i, course in enumerate(courses)
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO catalog_token (academic_year, term, token, position) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (*key, token, i)
+                    for i, course in enumerate(courses)
+                    for token in tokenize(f"{course.name}\n{course.information}")
+                ],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO catalog (academic_year, term, synced_time) "
+                "VALUES (?, ?, ?)",
+                (*key, synced_time),
+            )
+        record_seats(courses, app_dir)
+        return cls(store, *key, synced_time)
+
+    @classmethod
+    def load(
+        cls, time_info: TimeInfo | None = None, app_dir: Path | None = None
+    ) -> Self:
+        """读取课程目录
+
+        Args:
+            time_info (TimeInfo | None): 学年学期，为空时读取最近同步的目录
+            app_dir (Path | None): 档案目录，为空时使用当前档案
+
+        Raises:
+            LoadCatalogError: 没有对应的课程目录时抛出
+        """
+        store = get_store(app_dir)
+        if time_info is None:
+            rows = store.query(
+                "SELECT * FROM catalog ORDER BY synced_time DESC LIMIT 1"
+            )
+        else:
+            rows = store.query(
+                "SELECT * FROM catalog WHERE academic_year = ? AND term = ?",
+                (time_info.academic_year, time_info.term),
+            )
+        if not rows:
+            raise LoadCatalogError(
+                "[red]没有课程目录，请先运行 [cyan]`hch catalog sync`"
+            )
+        return cls(
+            store, rows[0]["academic_year"], rows[0]["term"], rows[0]["synced_time"]
+        )
+
+    def count(self) -> int:
+        return self.store.query(
+            "SELECT COUNT(*) FROM catalog_course WHERE academic_year = ? AND term = ?",
+            (self.academic_year, self.term),
+        )[0][0]
+
+    def token_count(self) -> int:
+        return self.store.query(
+            "SELECT COUNT(DISTINCT token) FROM catalog_token "
+            "WHERE academic_year = ? AND term = ?",
+            (self.academic_year, self.term),
+        )[0][0]
+
+    def get(self, id: str) -> Course | None:
+        """按课程 id 查找课程"""
+        rows = self.store.query(
+            "SELECT data FROM catalog_course "
+            "WHERE academic_year = ? AND term = ? AND id = ?",
+            (self.academic_year, self.term, id),
+        )
+        return load_courses_json([rows[0]["data"]])[0] if rows else None
+
+    def category(self, code: str) -> list[Course]:
+        """列出某一类别下的全部课程"""
+        rows = self.store.query(
+            "SELECT data FROM catalog_course "
+            "WHERE academic_year = ? AND term = ? AND code = ? ORDER BY position",
+            (self.academic_year, self.term, code),
+        )
+        return load_courses_json([row["data"] for row in rows])
+
+    def _postings(self, token: str) -> set[int]:
+        rows = self.store.query(
+            "SELECT position FROM catalog_token "
+            "WHERE academic_year = ? AND term = ? AND token = ?",
+            (self.academic_year, self.term, token),
+        )
+        return {row[0] for row in rows}
+
+    def search(self, keywords: list[str]) -> list[Course]:
+        """在本地搜索课程
+
+        每个关键词都需出现在课程名称或课程信息中。
+        先通过索引求出候选课程的交集，再逐一核对原文，排除两字词不相邻的误匹配。
+
+        Args:
+            keywords (list[str]): 关键词列表
+
+        Returns:
+            list[Course]: 匹配的课程，顺序与目录一致
+        """
+        candidates: set[int] | None = None
+        for keyword in keywords:
+            for token in query_tokens(keyword):
+                postings = self._postings(token)
+                candidates = postings if candidates is None else candidates & postings
+                if not candidates:
+                    return []
+
+        sql = "SELECT data FROM catalog_course WHERE academic_year = ? AND term = ?"
+        parameters: list[object] = [self.academic_year, self.term]
+        if candidates is not None:
+            sql += f" AND position IN ({', '.join('?' * len(candidates))})"
+            parameters.extend(candidates)
+        rows = self.store.query(sql + " ORDER BY position", parameters)
+
+        terms = [keyword.lower() for keyword in keywords]
+        results: list[Course] = []
+        for course in load_courses_json([row["data"] for row in rows]):
+            text = f"{course.name}\n{course.information}".lower()
+            if all(term in text for term in terms):
+                results.append(course)
+        return results
+
+    def information_parser(self) -> InformationParser:
+        """根据上次同步的结果构造解析器，kcxx 未变化的课程无需重新解析"""
+        rows = self.store.query(
+            "SELECT id, information_hash, data FROM catalog_course "
+            "WHERE academic_year = ? AND term = ? AND information_hash IS NOT NULL",
+            (self.academic_year, self.term),
+        )
+        courses = load_courses_json([row["data"] for row in rows])
+        return InformationParser(
+            {
+                course.id: (row["information_hash"], course.information)
+                for row, course in zip(rows, courses)
+            }
+        )
+
+
+async def fetch_catalog(
+    config: Config,
+    categories: list[dict[str, str]],
+    time_info: TimeInfo,
+    parser: InformationParser,
+) -> list[Course]:
+    """并发获取所有类别下的全部课程
+
+    同一门课程可能出现在多个类别中，只保留第一次出现的记录。
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        GetCourseError: 有其它错误时抛出
+    """
+    max_connections = max(config.concurrency, config.max_concurrency)
+    async with AsyncJwClient(config, max_connections) as client:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+            transient=True,
+        ) as progress:
+            progress.add_task(f"Fetching: [cyan]{len(categories)} [white]个类别")
+            results = await asyncio.gather(
+                *(
+                    get_courses_async(client, category, time_info, "", parser)
+                    for category in categories
+                )
+            )
+
+    courses: dict[str, Course] = {}
+    for category, category_courses in zip(categories, results):
+        console.print(
+            f"[green]{category['name']}：[white]{len(category_courses)} [green]门课程"
+        )
+        for course in category_courses:
+            courses.setdefault(course.id, course)
+    return list(courses.values())
+
+
+def load_information_parser(time_info: TimeInfo) -> InformationParser:
+    """从上次同步的同一学期目录中恢复解析结果，目录不存在或已失效时从头解析"""
+    try:
+        catalog = Catalog.load(time_info)
+    except LoadCatalogError:
+        return InformationParser()
+    return catalog.information_parser()
+
+
+def display_results(courses: list[Course]) -> None:
+    table = Table()
+    table.add_column("序号", style="cyan")
+    table.add_column("课程名称", style="magenta")
+    table.add_column("课程信息")
+    table.add_column("已选人数/总容量", style="yellow")
+    for i, course in enumerate(courses):
+        table.add_row(
+            f"{i + 1}",
+            course.name,
+            course.information.replace("\n", " "),
+            f"{course.enrolled}/{course.capacity}",
+        )
+    console.print(table)
+
+
+@app.callback()
+def main() -> None:
+    pass
+
+
+@app.command()
+def sync() -> None:
+    """
+    下载本学期全部课程并建立索引
+    """
+    config = load_config()
+    check_cookies(config)
+    assert config.cookies is not None
+    global retries
+    try:
+        with JwClient(config) as client:
+            time_info = None
+            while retries < config.max_retries and not time_info:
+                try:
+                    time_info = get_time_info(client)
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if time_info is None:
+                raise MaxRetriesError()
+
+            categories = None
+            while retries < config.max_retries and categories is None:
+                try:
+                    categories = get_course_categories(client, time_info)
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if categories is None:
+                raise MaxRetriesError()
+
+        parser = load_information_parser(time_info)
+        courses = None
+        while retries < config.max_retries and courses is None:
+            try:
+                courses = asyncio.run(
+                    fetch_catalog(config, categories, time_info, parser)
+                )
+            except CookieExpiredError:
+                get_cookies(config)
+                retries += 1
+        if courses is None:
+            raise MaxRetriesError()
+
+        catalog = Catalog.save(time_info, courses, parser)
+        console.print(
+            f"[green]已同步 [white]{len(courses)} [green]门课程，"
+            f"索引词 [white]{catalog.token_count()} [green]个，"
+            f"解析课程信息 [white]{parser.parsed} [green]门，"
+            f"复用 [white]{parser.reused} [green]门"
+        )
+
+    except (GetTimeInfoError, GetCourseCategoryError, GetCourseError) as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
+    except MaxRetriesError:
+        console.print("[red]尝试次数已达最大限制")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        console.print("[yellow]\n正在退出...[/yellow]")
+    finally:
+        config.save()
+
+
+@app.command()
+def search(
+    keywords: Annotated[list[str], typer.Argument(help="关键词，多个关键词需同时匹配")],
+    select: Annotated[
+        bool, typer.Option("--select", "-s", help="逐一选择搜索结果加入待抢列表")
+    ] = False,
+) -> None:
+    """
+    在本地课程目录中搜索课程
+    """
+    try:
+        catalog = Catalog.load()
+    except LoadCatalogError as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
+
+    start = time.perf_counter()
+    try:
+        results = catalog.search(keywords)
+    except ValidationError as e:
+        console.print(e)
+        raise typer.Exit(code=1)
+    elapsed = time.perf_counter() - start
+    console.print(
+        f"[green]在 [white]{catalog.count()} [green]门课程中找到 "
+        f"[white]{len(results)} [green]门，用时 [white]{elapsed * 1000:.2f} [green]ms "
+        f"[dim](同步于 {catalog.synced_time})"
+    )
+
+    if not select:
+        if results:
+            display_results(results)
+        return
+
+    try:
+        selected_courses = Course.load()
+    except ValidationError as e:
+        console.print(e)
+        raise typer.Exit(code=1)
+    except LoadCourseError:
+        selected_courses = []
+
+    try:
+        filter_courses(results, selected_courses)
+    except KeyboardInterrupt:
+        console.print("[yellow]\n正在退出...[/yellow]")
+    finally:
+        Course.save(selected_courses)
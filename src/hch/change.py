@@ -1,6 +1,7 @@
 import typer
 from pydantic import ValidationError
 
+from .cache import Cache
 from .console import console
 from .course import Course
 from .error import LoadCourseError
@@ -9,6 +10,24 @@ from .select import filter_courses
 app = typer.Typer()
 
 
+def update_from_cache(courses: list[Course], cache: Cache) -> None:
+    """使用缓存中最新的搜索结果更新课程的已选人数与容量，无需请求服务器
+
+    Args:
+        courses (list[Course]): 待更新的课程列表
+        cache (Cache)
+    """
+    latest: dict[str, dict[str, str | int]] = {}
+    for _, cached_courses in cache.items("courses/"):
+        for cached_course in cached_courses:
+            latest[cached_course["id"]] = cached_course
+
+    for course in courses:
+        if course.id in latest:
+            course.enrolled = int(latest[course.id]["enrolled"])
+            course.capacity = int(latest[course.id]["capacity"])
+
+
 @app.command(name="change")
 def main():
     """
@@ -23,6 +42,7 @@ def main():
         console.print(e)
         raise typer.Exit(code=1)
 
+    update_from_cache(pending_courses, Cache(ttl=0))
     filtered_courses: list[Course] = []
     try:
         filter_courses(pending_courses, filtered_courses)
@@ -0,0 +1,333 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Self
+
+import httpx
+
+from .config import Config
+from .error import BaseHunterError, CookieExpiredError
+from .limiter import AdaptiveLimiter, Outcome, is_throttled
+from .profiler import span
+from .telemetry import get_message, record_request
+
+MAX_RATE_FACTOR = 4
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0"
+
+
+def get_headers(cookies: str) -> dict[str, str]:
+    """生成 HTTP 请求头
+
+    根据提供的 Cookie 构造 HTTP 请求头字典。
+    使用预设的 User-Agent 确保请求行为与浏览器一致。
+
+    Args:
+        cookies (str): 用于身份验证的Cookie字符串
+
+    Returns:
+        dict[str, str]: 包含 User-Agent 和 Cookie 的请求头字典:
+    """
+    return {
+        "User-Agent": USER_AGENT,
+        "Cookie": cookies,
+    }
+
+
+def check_response(response: httpx.Response, error: type[BaseHunterError]) -> Any:
+    """检查教务系统接口的响应并解析 JSON
+
+    Args:
+        response (httpx.Response)
+        error (type[BaseHunterError]): 请求失败时抛出的异常类型
+
+    Returns:
+        Any: 解析后的 JSON 数据
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        BaseHunterError: 发生其它错误时抛出 error 类型的异常
+    """
+    check_headers(response, error)
+    return response.json()
+
+
+def check_headers(response: httpx.Response, error: type[BaseHunterError]) -> None:
+    """根据状态码与 Content-Type 检查响应，无需读取响应体
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        BaseHunterError: 发生其它错误时抛出 error 类型的异常
+    """
+    if response.status_code != 200:
+        raise error(f"[red]请求失败，状态码：{response.status_code}")
+
+    content_type = response.headers.get("Content-Type", "")
+    if "text/html" in content_type:
+        raise CookieExpiredError()
+    elif "application/json" not in content_type:
+        raise error("[red]响应内容不是有效的 JSON 格式")
+
+
+class JwClient:
+    """教务系统会话客户端
+
+    在一次命令执行期间复用同一个连接池，并统一管理 Cookie 与请求头。
+    Cookie 取自绑定的 Config，重新登录后会自动使用新的 Cookie。
+    """
+
+    def __init__(self, config: Config, max_connections: int = 4) -> None:
+        self.config = config
+        self._cookies = config.cookies or ""
+        self._client = httpx.Client(
+            base_url=config.base_url,
+            headers=get_headers(self._cookies),
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def _sync_cookies(self) -> None:
+        cookies = self.config.cookies or ""
+        if cookies != self._cookies:
+            self._cookies = cookies
+            self._client.headers["Cookie"] = cookies
+
+    def post(self, path: str, error: type[BaseHunterError], **kwargs: Any) -> Any:
+        """向教务系统发送 POST 请求
+
+        Args:
+            path (str): 接口路径
+            error (type[BaseHunterError]): 请求失败时抛出的异常类型
+            **kwargs: 传递给 httpx 的其它参数
+
+        Returns:
+            Any: 解析后的 JSON 数据
+
+        Raises:
+            CookieExpiredError: Cookie 失效时抛出
+            BaseHunterError: 发生其它错误时抛出 error 类型的异常
+        """
+        self._sync_cookies()
+        start = time.perf_counter()
+        try:
+            with span(f"POST {path}", "network"):
+                response = self._client.post(path, **kwargs)
+        except httpx.HTTPError as e:
+            record_request(self.config, "POST", path, start, error=repr(e))
+            raise error(f"[red]网络错误：{e!r}")
+        try:
+            result = check_response(response, error)
+        except BaseHunterError as e:
+            record_request(
+                self.config,
+                "POST",
+                path,
+                start,
+                response.status_code,
+                error=type(e).__name__,
+            )
+            raise
+        record_request(
+            self.config, "POST", path, start, response.status_code, get_message(result)
+        )
+        return result
+
+    @contextmanager
+    def stream(
+        self, path: str, error: type[BaseHunterError], **kwargs: Any
+    ) -> Iterator[httpx.Response]:
+        """向教务系统发送 POST 请求，响应体留给调用方边接收边处理
+
+        Args:
+            path (str): 接口路径
+            error (type[BaseHunterError]): 请求失败时抛出的异常类型
+            **kwargs: 传递给 httpx 的其它参数
+
+        Yields:
+            httpx.Response: 已检查过状态码与 Content-Type 的响应
+
+        Raises:
+            CookieExpiredError: Cookie 失效时抛出
+            BaseHunterError: 发生其它错误时抛出 error 类型的异常
+        """
+        self._sync_cookies()
+        status = None
+        recorded = False
+        start = time.perf_counter()
+        try:
+            with self._client.stream("POST", path, **kwargs) as response:
+                status = response.status_code
+                check_headers(response, error)
+                # 响应体的读取速度取决于调用方，只记录收到响应头的耗时
+                record_request(self.config, "POST", path, start, status)
+                recorded = True
+                yield response
+        except httpx.HTTPError as e:
+            if not recorded:
+                record_request(self.config, "POST", path, start, error=repr(e))
+            raise error(f"[red]网络错误：{e!r}")
+        except BaseHunterError as e:
+            if not recorded:
+                record_request(
+                    self.config, "POST", path, start, status, error=type(e).__name__
+                )
+            raise
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class AsyncJwClient:
+    """教务系统异步会话客户端，用法与 JwClient 相同
+
+    每个接口各有一个自适应限流器，并发数与请求速率随服务器的响应情况调整。
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        max_connections: int = 4,
+        concurrency: int | None = None,
+    ) -> None:
+        """
+        Args:
+            config (Config)
+            max_connections (int): 连接池大小
+            concurrency (int | None): 每个接口的初始并发上限，为空时使用配置
+        """
+        self.config = config
+        self.concurrency = config.concurrency if concurrency is None else concurrency
+        self.limiters: dict[str, AdaptiveLimiter] = {}
+        self._cookies = config.cookies or ""
+        self._client = httpx.AsyncClient(
+            base_url=config.base_url,
+            headers=get_headers(self._cookies),
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def _sync_cookies(self) -> None:
+        cookies = self.config.cookies or ""
+        if cookies != self._cookies:
+            self._cookies = cookies
+            self._client.headers["Cookie"] = cookies
+
+    async def post(self, path: str, error: type[BaseHunterError], **kwargs: Any) -> Any:
+        """向教务系统发送异步 POST 请求，参数与 JwClient.post 相同"""
+        return await self.send(self.build_request(path, **kwargs), error)
+
+    def build_request(self, path: str, **kwargs: Any) -> httpx.Request:
+        """预先构造 POST 请求，完成表单编码与请求头生成
+
+        Cookie 变化后需要重新构造。
+        """
+        self._sync_cookies()
+        return self._client.build_request("POST", path, **kwargs)
+
+    def get_limiter(self, path: str) -> AdaptiveLimiter:
+        if path not in self.limiters:
+            self.limiters[path] = AdaptiveLimiter(
+                self.concurrency,
+                self.config.max_concurrency,
+                self.config.rate_limit,
+                self.config.rate_limit * MAX_RATE_FACTOR,
+            )
+        return self.limiters[path]
+
+    async def send(self, request: httpx.Request, error: type[BaseHunterError]) -> Any:
+        """发送预先构造的请求，参数与返回值同 post
+
+        请求会在所属接口的限流器允许后才发出，并把结果反馈给限流器。
+        """
+        limiter = self.get_limiter(request.url.path)
+        await limiter.acquire()
+        outcome = Outcome.NEUTRAL
+        status = message = failure = None
+        start = time.perf_counter()
+        try:
+            try:
+                with span(f"{request.method} {request.url.path}", "network"):
+                    response = await self._client.send(request)
+            except httpx.HTTPError as e:
+                outcome = Outcome.OVERLOAD
+                failure = repr(e)
+                raise error(f"[red]网络错误：{e!r}")
+
+            status = response.status_code
+            if status >= 500 or status == 429:
+                outcome = Outcome.OVERLOAD
+            try:
+                result = check_response(response, error)
+            except BaseHunterError as e:
+                failure = type(e).__name__
+                raise
+            message = get_message(result)
+            if is_throttled(message):
+                outcome = Outcome.OVERLOAD
+            else:
+                outcome = Outcome.SUCCESS
+            return result
+        finally:
+            limiter.release(outcome, time.perf_counter() - start)
+            record_request(
+                self.config,
+                request.method,
+                request.url.path,
+                start,
+                status,
+                message,
+                failure,
+            )
+
+    async def probe(self) -> tuple[float, float, str | None]:
+        """发送一次探测请求
+
+        Returns:
+            tuple[float, float, str | None]: 发送时的本地时间、往返时间（秒）
+            与服务器返回的 Date 响应头
+
+        Raises:
+            httpx.HTTPError: 网络错误时抛出
+        """
+        sent_at = time.time()
+        start = time.perf_counter()
+        response = await self._client.head("/", follow_redirects=False)
+        rtt = time.perf_counter() - start
+        return sent_at, rtt, response.headers.get("Date")
+
+    async def warm_up(self, connections: int) -> None:
+        """预先建立并保持指定数量的长连接
+
+        同时发出 connections 个 HEAD 请求，使连接池中保留相应数量的空闲连接，
+        之后的请求可以直接复用，无需再进行 DNS 解析与 TCP 握手。
+        网络错误会被忽略。
+        """
+
+        async def touch() -> None:
+            try:
+                await self._client.head("/", follow_redirects=False)
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(*(touch() for _ in range(connections)))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
@@ -4,9 +4,11 @@ from pathlib import Path
 from typing import Self
 
 import typer
-from pydantic import BaseModel, ValidationError, Field
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
 
-from .console import console
+from .paths import get_app_dir
+from .profiler import span
+from .store import get_store
 
 
 class Config(BaseModel):
@@ -16,34 +18,87 @@ class Config(BaseModel):
     wait_time: int = Field(default=2, ge=0)
     cookies: str | None = None
     max_retries: int = Field(default=3, ge=0)
+    concurrency: int = Field(default=8, ge=1)
+    max_concurrency: int = Field(default=32, ge=1)
+    rate_limit: float = Field(default=20, ge=0)
+    connections: int = Field(default=8, ge=1)
+    prearm_time: int = Field(default=10, ge=0)
+    clock_probes: int = Field(default=8, ge=0)
+    base_url: str = "http://jw.hitsz.edu.cn"
+    cas_url: str = "https://ids.hit.edu.cn"
+    cache_ttl: int = Field(default=300, ge=0)
+    session_check_interval: int = Field(default=60, ge=1)
+    relogin_time: int = Field(default=60, ge=0)
+    telemetry: bool = True
+
+    _app_dir: Path = PrivateAttr(default_factory=get_app_dir)
+    _saved: dict[str, str] = PrivateAttr(default_factory=dict)
+    """上次读取或保存时各字段的 JSON，保存时只写入有变化的字段"""
+
+    @property
+    def app_dir(self) -> Path:
+        """配置所属档案的数据目录"""
+        return self._app_dir
 
     @classmethod
-    def load(cls, path: str | Path | None = None) -> Self:
-        try:
-            if path is None:
-                app_dir = typer.get_app_dir("hch")
-                path = Path(app_dir) / "config.json"
-            with open(path, "r") as f:
-                config = json.load(f)
-
-            assert type(config) is dict
-            return cls.model_validate(config)
-        except FileNotFoundError:
-            return cls()
-
-    def save(self, path: str | Path | None = None) -> None:
-        if path is None:
-            app_dir = typer.get_app_dir("hch")
-            path = Path(app_dir) / "config.json"
-            path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, mode="w") as f:
-            f.write(self.model_dump_json(indent=4))
-
-
-def load_config() -> Config:
+    def load(cls, profile: str | None = None) -> Self:
+        app_dir = get_app_dir(profile)
+        rows = get_store(app_dir).query("SELECT key, value FROM config")
+        result = cls.model_validate(
+            {row["key"]: json.loads(row["value"]) for row in rows}
+        )
+        result._app_dir = app_dir
+        result._saved = result._dump_fields()
+        return result
+
+    def reload(self) -> None:
+        """重新读取档案的配置，获取其它进程保存的修改
+
+        供长期运行的守护进程在处理每个请求前调用，就地更新以保持其它对象的引用有效。
+        """
+        rows = get_store(self.app_dir).query("SELECT key, value FROM config")
+        latest = self.model_validate(
+            {row["key"]: json.loads(row["value"]) for row in rows}
+        )
+        for name in type(self).model_fields:
+            setattr(self, name, getattr(latest, name))
+        self._saved = self._dump_fields()
+
+    def _dump_fields(self) -> dict[str, str]:
+        return {
+            key: json.dumps(value)
+            for key, value in self.model_dump(mode="json").items()
+        }
+
+    def save(self) -> None:
+        """保存有变化的字段
+
+        只写入自读取以来修改过的字段，其它进程同时修改的字段不会被覆盖，
+        例如抢课过程中执行 `hch set` 修改的配置。
+        """
+        fields = self._dump_fields()
+        changed = [
+            (key, value)
+            for key, value in fields.items()
+            if self._saved.get(key) != value
+        ]
+        if changed:
+            with get_store(self.app_dir).transaction() as connection:
+                connection.executemany(
+                    "INSERT INTO config (key, value) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    changed,
+                )
+        self._saved = fields
+
+
+def load_config(profile: str | None = None) -> Config:
     try:
-        config = Config.load()
+        with span("load_config", "io"):
+            config = Config.load(profile=profile)
     except ValidationError as e:
+        from .console import console
+
         console.print(e)
         raise typer.Exit(code=1)
 
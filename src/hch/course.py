@@ -1,84 +1,264 @@
-import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Self
+from typing import TYPE_CHECKING
 
-import httpx
-import typer
-from pydantic import BaseModel
+from pydantic import TypeAdapter
 
-from .error import CookieExpiredError, HuntCourseError, LoadCourseError
-from .login import get_headers
+from .error import HuntCourseError, LoadCourseError
+from .paths import get_app_dir
+from .store import get_store
 
+if TYPE_CHECKING:
+    import httpx
+
+    from .client import AsyncJwClient, JwClient
+
+
+_loaded: dict[Path, dict[str, tuple[str, int, str | None, str]]] = {}
+"""各档案上次读取或保存时待抢列表的 (id, position, grp, data)，保存时只写入有变化的课程"""
+
+
+@dataclass(slots=True)
+class Course:
+    """课程
+
+    普通的 slots 数据类，构造时不做校验。服务器响应与本地存储中的数据
+    分别由 tools 中的 TypeAdapter 与 courses_adapter 整批校验后再构造。
+    """
 
-class Course(BaseModel):
     id: str
     name: str
     information: str
     code: str
     academic_year: str
     term: str
-    capacity: str
-    enrolled: str
-    hunted_time: str | None
+    capacity: int
+    enrolled: int
+    hunted_time: str | None = None
+    group: str | None = None
+    """备选分组，同组课程只需选上一门，在列表中的顺序即优先级"""
+
+    @property
+    def available(self) -> bool:
+        """是否有余量"""
+        return self.enrolled < self.capacity
 
     @classmethod
-    def load(cls, path: str | Path | None = None) -> list[Self]:
-        error_message = "[red]没有课程，请先运行 [cyan]`hch select`"
-        try:
-            if path is None:
-                app_dir = typer.get_app_dir("hch")
-                path = Path(app_dir) / "courses.json"
-            with open(path, "r") as f:
-                courses = json.load(f)
-                courses = [cls.model_validate(course) for course in courses]
-
-            if len(courses) == 0:
-                raise LoadCourseError(error_message)
-            return courses
-        except FileNotFoundError:
-            raise LoadCourseError(error_message)
+    def load(cls, profile: str | None = None) -> list["Course"]:
+        """读取待抢课程列表
+
+        同时记录读取到的内容，保存时只写入本进程修改过的课程。
+        """
+        app_dir = get_app_dir(profile)
+        rows = get_store(app_dir).query(
+            "SELECT id, position, grp, data FROM queue ORDER BY position"
+        )
+        _loaded[app_dir] = {row["id"]: tuple(row) for row in rows}
+        if len(rows) == 0:
+            raise LoadCourseError("[red]没有课程，请先运行 [cyan]`hch select`")
+        return load_courses_json([row["data"] for row in rows])
 
     @classmethod
-    def save(cls, courses: list[Self], path: str | Path | None = None) -> None:
-        if path is None:
-            app_dir = typer.get_app_dir("hch")
-            path = Path(app_dir) / "courses.json"
-            path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "w") as f:
-            dump_courses = [cls.model_dump(course) for course in courses]
-            json.dump(dump_courses, f, ensure_ascii=False, indent=4)
-
-    def hunt(self, cookies: str) -> None:
-        """尝试选课
+    def save(cls, courses: list["Course"], profile: str | None = None) -> None:
+        """保存待抢课程列表
 
-        Args:
-            cookies (str)
+        与 load 时读取到的内容比较，在一个事务中只删除本进程移除的课程、
+        写入本进程新增或修改的课程。其它进程在此期间的修改（例如抢课进程
+        选上后移除的课程）不会被覆盖，也不会被重新加入。
+        """
+        app_dir = get_app_dir(profile)
+        loaded = _loaded.get(app_dir, {})
+        rows = {
+            course.id: (course.id, position, course.group, dump_course_json(course))
+            for position, course in enumerate(courses)
+        }
+        with get_store(app_dir).transaction() as connection:
+            connection.executemany(
+                "DELETE FROM queue WHERE id = ?",
+                [(id,) for id in loaded if id not in rows],
+            )
+            # 读取时已有的课程只更新，已被其它进程移除的不再加入
+            connection.executemany(
+                "UPDATE queue SET position = ?, grp = ?, data = ? WHERE id = ?",
+                [
+                    (*row[1:], id)
+                    for id, row in rows.items()
+                    if id in loaded and loaded[id] != row
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO queue (id, position, grp, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET position = excluded.position, "
+                "grp = excluded.grp, data = excluded.data",
+                [row for id, row in rows.items() if id not in loaded],
+            )
+        _loaded[app_dir] = rows
 
-        Raises:
-            HuntCourseError: 选课失败时抛出
-            CookieExpiredError: Cookie 失效时抛出
+    def mark_hunted(self, app_dir: Path | None = None) -> None:
+        """记录课程已选上
+
+        在一个事务中从待抢列表移除该课程及其同组备选，并写入选课历史。
+        选上后立即调用，即使进程随后崩溃，下次运行也不会重复选课。
+
+        Args:
+            app_dir (Path | None): 档案目录，为空时使用当前档案
         """
-        headers = get_headers(cookies)
-        url = "http://jw.hitsz.edu.cn/Xsxk/addGouwuche"
-        data = {
+        with get_store(app_dir).transaction() as connection:
+            connection.execute(
+                "DELETE FROM queue WHERE id = ? OR (grp IS NOT NULL AND grp = ?)",
+                (self.id, self.group),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO hunted (academic_year, term, id, name, time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.academic_year,
+                    self.term,
+                    self.id,
+                    self.name,
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+
+    def hunt_data(self) -> dict[str, str]:
+        return {
             "p_xktjz": "rwtjzyx",
             "p_xn": self.academic_year,
             "p_xq": self.term,
             "p_xkfsdm": self.code,
             "p_id": self.id,
         }
-        response = httpx.post(url, data=data, headers=headers)
-        if response.status_code == 200:
-            if "application/json" in response.headers["Content-Type"]:
-                response_json = response.json()
-                message = response_json["message"]
-                if message == "操作成功":
-                    return
-                else:
-                    raise HuntCourseError(f"[red]{message}")
-            elif "text/html" in response.headers["Content-Type"]:
-                raise CookieExpiredError()
-            else:
-                raise HuntCourseError("[red]响应内容不是有效的 JSON 格式")
-        else:
-            raise HuntCourseError(f"[red]请求失败，状态码：{response.status_code}")
+
+    def hunt(self, client: "JwClient") -> None:
+        """尝试选课
+
+        Args:
+            client (JwClient)
+
+        Raises:
+            HuntCourseError: 选课失败时抛出
+            CookieExpiredError: Cookie 失效时抛出
+        """
+        response_json = client.post(
+            "/Xsxk/addGouwuche", HuntCourseError, data=self.hunt_data()
+        )
+        check_hunt_message(response_json)
+
+    def build_hunt_request(self, client: "AsyncJwClient") -> "httpx.Request":
+        """预先构造选课请求，Cookie 变化后需要重新构造"""
+        return client.build_request("/Xsxk/addGouwuche", data=self.hunt_data())
+
+    async def hunt_async(
+        self, client: "AsyncJwClient", request: "httpx.Request | None" = None
+    ) -> None:
+        """异步尝试选课
+
+        Args:
+            client (AsyncJwClient)
+            request (httpx.Request | None): 预先构造的选课请求，为空时即时构造
+
+        Raises:
+            HuntCourseError: 选课失败时抛出
+            CookieExpiredError: Cookie 失效时抛出
+        """
+        if request is None:
+            request = self.build_hunt_request(client)
+        response_json = await client.send(request, HuntCourseError)
+        check_hunt_message(response_json)
+
+
+def check_hunt_message(response_json: dict[str, str]) -> None:
+    """检查选课接口返回的消息
+
+    Raises:
+        HuntCourseError: 选课失败时抛出
+    """
+    message = response_json["message"]
+    if message != "操作成功":
+        raise HuntCourseError(f"[red]{message}")
+
+
+course_adapter = TypeAdapter(Course)
+courses_adapter = TypeAdapter(list[Course])
+
+
+def dump_course_json(course: Course) -> str:
+    return course_adapter.dump_json(course).decode("utf-8")
+
+
+def load_courses_json(documents: list[str]) -> list[Course]:
+    """将多门课程的 JSON 拼接后一次性校验，旧数据中字符串形式的人数会转为整数
+
+    Raises:
+        ValidationError: 数据格式错误时抛出
+    """
+    return courses_adapter.validate_json("[" + ",".join(documents) + "]")
+
+
+def requeue_courses(courses: list[Course], app_dir: Path | None = None) -> None:
+    """把记为已选上、实际并未选上的课程放回待抢列表最前面，并从选课历史中删除
+
+    Args:
+        courses (list[Course]): 同一组课程，按优先级排列
+        app_dir (Path | None): 档案目录，为空时使用当前档案
+    """
+    with get_store(app_dir).transaction() as connection:
+        first = connection.execute(
+            "SELECT COALESCE(MIN(position), 0) FROM queue"
+        ).fetchone()[0]
+        connection.executemany(
+            "INSERT OR REPLACE INTO queue (id, position, grp, data) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    course.id,
+                    first - len(courses) + i,
+                    course.group,
+                    dump_course_json(course),
+                )
+                for i, course in enumerate(courses)
+            ],
+        )
+        connection.executemany(
+            "DELETE FROM hunted WHERE academic_year = ? AND term = ? AND id = ?",
+            [(course.academic_year, course.term, course.id) for course in courses],
+        )
+
+
+def record_seats(courses: list[Course], app_dir: Path | None = None) -> None:
+    """记录课程当前的已选人数与容量，用于查看余量变化
+
+    Args:
+        courses (list[Course])
+        app_dir (Path | None): 档案目录，为空时使用当前档案
+    """
+    now = time.time()
+    with get_store(app_dir).transaction() as connection:
+        connection.executemany(
+            "INSERT INTO seat_history "
+            "(academic_year, term, id, time, enrolled, capacity) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    course.academic_year,
+                    course.term,
+                    course.id,
+                    now,
+                    course.enrolled,
+                    course.capacity,
+                )
+                for course in courses
+            ],
+        )
+
+
+def group_courses(courses: list[Course]) -> list[list[Course]]:
+    """按备选分组整理课程
+
+    未分组的课程单独成组；组内保持在列表中的顺序，即优先级从高到低。
+    """
+    groups: dict[str, list[Course]] = {}
+    for course in courses:
+        groups.setdefault(course.group or f"id:{course.id}", []).append(course)
+    return list(groups.values())
@@ -0,0 +1,402 @@
+import asyncio
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, TypeVar, cast
+
+import typer
+from pydantic import ValidationError
+
+from .cache import Cache, course_key
+from .client import AsyncJwClient, JwClient
+from .config import Config, load_config
+from .console import console
+from .course import Course, courses_adapter
+from .error import (
+    BaseHunterError,
+    CookieExpiredError,
+    DaemonError,
+    GetTimeInfoError,
+    MaxRetriesError,
+)
+from .grade import Grade
+from .hunt import hunt, log_sink
+from .ipc import connect, get_socket_path, read_message, send_message
+from .list.hunted import get_hunted_courses
+from .login import get_cookies
+from .time_info import TimeInfo
+from .tools import get_course_categories, get_courses
+
+T = TypeVar("T")
+
+WARM_UP_INTERVAL = 15
+
+app = typer.Typer(name="daemon", help="后台常驻服务")
+
+
+class Daemon:
+    """常驻内存的教务系统会话
+
+    保持连接池、Cookie、学年学期信息、课程类别与搜索结果，
+    每隔 session_check_interval 秒检查一次会话，失效时立即重新登录，
+    客户端的请求无需再登录或重新获取这些信息。
+    抢课在常驻的事件循环中使用同一个异步客户端，连接池每隔 WARM_UP_INTERVAL 秒
+    保活一次，限流器的状态也在多次抢课之间保留。
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.client = JwClient(config, config.connections)
+        self.async_client = AsyncJwClient(
+            config,
+            max(config.concurrency, config.max_concurrency, config.connections),
+        )
+        self.loop = asyncio.new_event_loop()
+        self.cache = Cache(config.cache_ttl, config.app_dir)
+        self.started = time.time()
+        self.requests = 0
+        self.time_info: TimeInfo | None = None
+        self.categories: list[dict[str, str]] | None = None
+        self.searches: dict[str, tuple[float, list[dict[str, Any]]]] = {}
+        """课程搜索结果，键为缓存键，值为 (获取时间, 课程 JSON)"""
+        self.login_lock = threading.Lock()
+        self.hunt_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def relogin(self, cookies: str | None) -> None:
+        """Cookie 失效时重新登录，多个请求同时失效时只登录一次"""
+        with self.login_lock:
+            if self.config.cookies == cookies:
+                console.print("Cookie 过期，尝试重新获取", style="yellow")
+                get_cookies(self.config)
+                self.config.save()
+
+    def request(self, func: Callable[[], T]) -> T:
+        """调用教务系统接口，Cookie 失效时重新登录后重试
+
+        Raises:
+            MaxRetriesError: 重新登录次数达到 max_retries 时抛出
+        """
+        retries = 0
+        while True:
+            cookies = self.config.cookies
+            try:
+                if cookies is None:
+                    raise CookieExpiredError()
+                return func()
+            except CookieExpiredError:
+                if retries >= self.config.max_retries:
+                    raise MaxRetriesError("[red]尝试次数已达最大限制")
+                self.relogin(cookies)
+                retries += 1
+
+    def get_time_info(self) -> TimeInfo:
+        if self.time_info is None:
+            self.time_info = self.request(lambda: TimeInfo.get(self.client))
+        return self.time_info
+
+    def get_categories(self) -> list[dict[str, str]]:
+        if self.categories is None:
+            time_info = self.get_time_info()
+            self.categories = self.request(
+                lambda: get_course_categories(self.client, time_info)
+            )
+        return self.categories
+
+    def search(self, code: str, keyword: str, refresh: bool) -> list[dict[str, Any]]:
+        time_info = self.get_time_info()
+        key = course_key(time_info.academic_year, time_info.term, code, keyword)
+        entry = self.searches.get(key)
+        if (
+            not refresh
+            and entry is not None
+            and time.time() - entry[0] <= self.config.cache_ttl
+        ):
+            return entry[1]
+
+        category = next(
+            (
+                category
+                for category in self.get_categories()
+                if category["code"] == code
+            ),
+            None,
+        )
+        if category is None:
+            raise DaemonError(f"[red]找不到课程类别 {code}")
+        courses = self.request(
+            lambda: get_courses(self.client, category, time_info, keyword)
+        )
+        value = courses_adapter.dump_python(courses, mode="json")
+        self.searches[key] = (time.time(), value)
+        self.cache.set(key, value)
+        return value
+
+    def run_loop(self) -> None:
+        """运行常驻的事件循环，空闲时定期保活异步客户端的连接，退出时关闭客户端"""
+
+        async def keep_warm() -> None:
+            while not self.stopped.is_set():
+                # 抢课期间由抢课流程自行保活，到点前不能有其它请求占用连接
+                if not self.hunt_lock.locked():
+                    await self.async_client.warm_up(self.config.connections)
+                await asyncio.to_thread(self.stopped.wait, WARM_UP_INTERVAL)
+            await self.async_client.aclose()
+
+        try:
+            self.loop.run_until_complete(keep_warm())
+        finally:
+            self.loop.close()
+
+    def keep_alive(self) -> None:
+        """定期检查会话，失效时立即重新登录，使客户端请求时会话总是有效的"""
+        while not self.stopped.wait(self.config.session_check_interval):
+            cookies = self.config.cookies
+            try:
+                self.client.post(
+                    "/Xsxk/queryXkdqXnxq", GetTimeInfoError, data={"mxpylx": "1"}
+                )
+            except CookieExpiredError:
+                try:
+                    self.relogin(cookies)
+                except BaseHunterError as e:
+                    console.print(f"{e}")
+            except BaseHunterError:
+                continue
+
+    def handle(self, method: str, params: dict[str, Any], handler: "Handler") -> Any:
+        """处理一个请求，返回值作为结果发给客户端"""
+        # 抢课期间配置由抢课流程独占，重新读取会覆盖其在内存中的修改；
+        # 持有登录锁，避免在重新登录与保存之间读到旧的 Cookie
+        if not self.hunt_lock.locked():
+            with self.login_lock:
+                self.config.reload()
+        match method:
+            case "status":
+                return {
+                    "pid": os.getpid(),
+                    "started": self.started,
+                    "requests": self.requests,
+                    "username": self.config.username,
+                    "time_info": self.time_info and self.time_info.model_dump(),
+                    "categories": self.categories and len(self.categories),
+                    "searches": len(self.searches),
+                }
+            case "time_info":
+                return self.get_time_info().model_dump()
+            case "categories":
+                return self.get_categories()
+            case "courses":
+
+                def search(query: list[str]) -> list[dict[str, Any]]:
+                    code, keyword = query
+                    return self.search(code, keyword, params["refresh"])
+
+                with ThreadPoolExecutor(self.config.connections) as executor:
+                    return list(executor.map(search, params["queries"]))
+            case "hunted":
+                time_info = self.get_time_info()
+                courses = self.request(
+                    lambda: get_hunted_courses(self.client, time_info)
+                )
+                return courses_adapter.dump_python(courses, mode="json")
+            case "grades":
+                if params.get("probe"):
+                    return self.request(lambda: Grade.get_total(self.client))
+                grades = self.request(lambda: Grade.get(self.client))
+                return [grade.model_dump() for grade in grades]
+            case "hunt":
+                return self.hunt(params, handler)
+            case "stop":
+                self.stopped.set()
+                return None
+        raise DaemonError(f"[red]未知的请求：{method}")
+
+    def hunt(self, params: dict[str, Any], handler: "Handler") -> Any:
+        """在守护进程中抢课，抢课信息转发给客户端，客户端断开时取消抢课"""
+        if not self.hunt_lock.acquire(blocking=False):
+            raise DaemonError("[red]守护进程正在抢课")
+        try:
+            pending_courses = Course.load()
+            target_time = None if params["now"] else self.config.target_time
+            wait_time = params["wait_time"]
+            concurrency = params["concurrency"]
+
+            if concurrency is not None:
+                # 只影响之后新建的限流器，已有限流器保留调整后的状态
+                self.async_client.concurrency = concurrency
+
+            def forward(message: str, style: str | None) -> None:
+                try:
+                    send_message(handler.wfile, {"log": message, "style": style})
+                except OSError:
+                    pass
+
+            async def run() -> None:
+                log_sink.set(forward)
+                task = asyncio.create_task(
+                    hunt(
+                        pending_courses,
+                        self.config,
+                        self.config.wait_time if wait_time is None else wait_time,
+                        self.async_client.concurrency,
+                        target_time,
+                        self.async_client,
+                    )
+                )
+                # 客户端不会再发送数据，可读即表示连接已关闭
+                loop = asyncio.get_running_loop()
+                loop.add_reader(handler.connection.fileno(), task.cancel)
+                try:
+                    await task
+                finally:
+                    loop.remove_reader(handler.connection.fileno())
+
+            # 在常驻的事件循环中抢课，复用已预热的连接
+            future = asyncio.run_coroutine_threadsafe(run(), self.loop)
+            try:
+                future.result()
+            except CancelledError:
+                console.print("客户端已断开，取消抢课", style="yellow")
+            finally:
+                self.config.save()
+            return {"pending": len(pending_courses)}
+        finally:
+            self.hunt_lock.release()
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon = cast(Server, self.server).daemon
+        while (message := read_message(self.rfile)) is not None:
+            daemon.requests += 1
+            method = message.get("method")
+            start = time.perf_counter()
+            try:
+                if not isinstance(method, str):
+                    raise DaemonError("[red]请求缺少 method")
+                result = daemon.handle(method, message.get("params", {}), self)
+                response = {"result": result}
+            except BaseHunterError as e:
+                response = {"error": str(e)}
+            except ValidationError as e:
+                response = {"error": f"{e}"}
+            except Exception as e:
+                console.print_exception()
+                response = {"error": f"[red]守护进程出错：{e!r}"}
+            console.print(
+                f"[dim]{datetime.now().strftime('%H:%M:%S')}[/dim] [cyan]{method} "
+                f"[white]{(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+            try:
+                send_message(self.wfile, response)
+            except OSError:
+                return
+            if daemon.stopped.is_set():
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: Daemon) -> None:
+        self.daemon = daemon
+        super().__init__(path, Handler)
+
+
+@app.callback()
+def main() -> None:
+    pass
+
+
+@app.command()
+def start() -> None:
+    """
+    在前台启动守护进程，按 Ctrl+C 退出
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        console.print("[red]当前系统不支持 Unix 套接字")
+        raise typer.Exit(code=1)
+
+    config = load_config()
+    path = get_socket_path(config.app_dir)
+    client = connect(config.app_dir)
+    if client is not None:
+        client.close()
+        console.print("[yellow]守护进程已在运行")
+        raise typer.Exit(code=1)
+    # 上次未正常退出时残留的套接字文件
+    path.unlink(missing_ok=True)
+
+    daemon = Daemon(config)
+    try:
+        daemon.get_categories()
+    except BaseHunterError as e:
+        # 失败的信息会在客户端第一次请求时重新获取
+        console.print(f"{e}")
+
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(str(path), daemon)
+    finally:
+        os.umask(old_umask)
+    threading.Thread(target=daemon.keep_alive, daemon=True).start()
+    loop_thread = threading.Thread(target=daemon.run_loop, daemon=True)
+    loop_thread.start()
+    console.print(f"[green]守护进程已启动，监听 [white]{path}")
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n退出程序", style="yellow")
+    finally:
+        daemon.stopped.set()
+        path.unlink(missing_ok=True)
+        loop_thread.join(timeout=5)
+        daemon.client.close()
+        config.save()
+    console.print("[green]守护进程已退出")
+
+
+@app.command()
+def stop() -> None:
+    """
+    停止守护进程
+    """
+    client = connect()
+    if client is None:
+        console.print("[yellow]守护进程未运行")
+        raise typer.Exit(code=1)
+    with client:
+        client.call("stop")
+    console.print("[green]已通知守护进程退出")
+
+
+@app.command()
+def status() -> None:
+    """
+    查看守护进程状态
+    """
+    client = connect()
+    if client is None:
+        console.print("[yellow]守护进程未运行")
+        raise typer.Exit(code=1)
+    with client:
+        start = time.perf_counter()
+        result = client.call("status")
+        elapsed = time.perf_counter() - start
+    console.print(f"[cyan]PID: [white]{result['pid']}")
+    console.print(
+        "[cyan]启动时间: [white]"
+        f"{datetime.fromtimestamp(result['started']).strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+    console.print(f"[cyan]用户名: [white]{result['username']}")
+    console.print(f"[cyan]已处理请求: [white]{result['requests']}")
+    console.print(f"[cyan]课程类别: [white]{result['categories']}")
+    console.print(f"[cyan]已缓存搜索: [white]{result['searches']}")
+    console.print(f"[cyan]响应时间: [white]{elapsed * 1000:.2f} ms")
@@ -41,3 +41,15 @@ class GetHuntedCourseError(BaseHunterError):
 
 class GetGradeError(BaseHunterError):
     pass
+
+
+class LoadCatalogError(BaseHunterError):
+    pass
+
+
+class LoadPlanError(BaseHunterError):
+    pass
+
+
+class DaemonError(BaseHunterError):
+    pass
@@ -1,15 +1,35 @@
-from typing import Self
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Callable, Self, TypeVar
 
-import httpx
 import typer
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from rich.table import Table
+from typing_extensions import Annotated
 
-from .config import load_config
+from .cache import GRADES_KEY, Cache
+from .client import JwClient
+from .config import Config, load_config
 from .console import console
-from .error import CookieExpiredError, GetGradeError, MaxRetriesError
-from .login import get_cookies, get_headers
-from .spinning import run_spinning
+from .error import (
+    CookieExpiredError,
+    DaemonError,
+    GetGradeError,
+    MaxRetriesError,
+)
+from .ipc import DaemonClient, connect
+from .profiler import CProfileOption, TraceOption, span, traced
+from .profiler import enable as enable_profiling
+from .spinning import check_cookies, get_cookies, run_spinning
+
+T = TypeVar("T")
+
+PAGE_SIZE = 100
+MAX_PAGE_WORKERS = 8
+FULL_REFRESH_POLLS = 10
 
 
 class Grade(BaseModel):
@@ -19,49 +39,96 @@ class Grade(BaseModel):
     rank: str
     total_students: str
 
+    @property
+    def key(self) -> str:
+        """区分不同成绩记录的键"""
+        return f"{self.course_name}/{self.course_type}"
+
     @classmethod
-    def get(cls, cookies: str) -> list[Self]:
-        headers = get_headers(cookies)
-        url = "http://jw.hitsz.edu.cn/cjgl/grcjcx/grcjcx"
+    def get_page(
+        cls, client: JwClient, current: int, page_size: int = PAGE_SIZE
+    ) -> tuple[list[Self], int]:
+        """获取一页成绩
+
+        Args:
+            client (JwClient)
+            current (int): 页码，从 1 开始
+            page_size (int): 每页记录数
+
+        Returns:
+            tuple[list[Self], int]: 本页的成绩与成绩总数
+
+        Raises:
+            CookieExpiredError: Cookie 失效时抛出
+            GetGradeError: 有其它错误时抛出
+        """
         data = {
             "pylx": "1",
-            "current": 1,
-            "pageSize": 100,
+            "current": current,
+            "pageSize": page_size,
         }
 
-        response = httpx.post(url, json=data, headers=headers, follow_redirects=True)
-        if response.status_code == 200:
-            if "application/json" in response.headers["Content-Type"]:
-                response_json = response.json()
-                try:
-                    elements: list[dict[str, str]] = response_json["content"]["list"]
-                    grades: list[Self] = []
-                    for element in elements:
-                        grades.append(
-                            cls(
-                                score=element["zzcj"],
-                                course_type=element["khfs"],
-                                course_name=element["kcmc"],
-                                rank=element["pm"],
-                                total_students=element["zrs"],
-                            )
+        response_json = client.post("/cjgl/grcjcx/grcjcx", GetGradeError, json=data)
+        try:
+            content = response_json["content"]
+            elements: list[dict[str, str]] = content["list"]
+            grades: list[Self] = []
+            with span("Grade", "validate", count=len(elements)):
+                for element in elements:
+                    grades.append(
+                        cls(
+                            score=element["zzcj"],
+                            course_type=element["khfs"],
+                            course_name=element["kcmc"],
+                            rank=element["pm"],
+                            total_students=element["zrs"],
                         )
-                    return grades
-                except TypeError:
-                    message = response_json["msg"]
-                    raise GetGradeError(message)
-            elif "text/html" in response.headers["Content-Type"]:
-                raise CookieExpiredError()
-            else:
-                raise GetGradeError("[red]响应内容不是有效的 JSON 格式")
-        else:
-            raise GetGradeError(f"[red]请求失败，状态码：{response.status_code}")
+                    )
+            # 没有分页信息时视为只有一页
+            total = int(content.get("total", len(elements)))
+            return grades, total
+        except TypeError:
+            message = response_json["msg"]
+            raise GetGradeError(message)
+
+    @classmethod
+    @traced("Grade.get")
+    def get(cls, client: JwClient) -> list[Self]:
+        """获取全部成绩
+
+        先获取第一页得到成绩总数，其余页并发获取，按页码顺序合并。
+
+        Raises:
+            CookieExpiredError: Cookie 失效时抛出
+            GetGradeError: 有其它错误时抛出
+        """
+        grades, total = cls.get_page(client, 1)
+        pages = math.ceil(total / PAGE_SIZE)
+        if pages > 1:
+            with ThreadPoolExecutor(min(pages - 1, MAX_PAGE_WORKERS)) as executor:
+                for page, _ in executor.map(
+                    partial(cls.get_page, client), range(2, pages + 1)
+                ):
+                    grades.extend(page)
+        return grades
+
+    @classmethod
+    def get_total(cls, client: JwClient) -> int:
+        """只获取成绩总数，用于低开销地检查是否有新成绩"""
+        return cls.get_page(client, 1, page_size=1)[1]
 
 
+grades_adapter = TypeAdapter(list[Grade])
 app = typer.Typer()
 
 
-def display_grades(grades: list[Grade]) -> None:
+def display_grades(grades: list[Grade], changed: set[str] | None = None) -> None:
+    """显示成绩表格
+
+    Args:
+        grades (list[Grade])
+        changed (set[str] | None): 新发布或有变化的成绩的键，这些行会高亮显示
+    """
     table = Table()
     table.add_column("课程", style="cyan")
     table.add_column("类别", style="magenta")
@@ -73,33 +140,158 @@ def display_grades(grades: list[Grade]) -> None:
             grade.course_type,
             grade.score,
             f"{grade.rank}/{grade.total_students}",
+            style="bold reverse" if changed and grade.key in changed else None,
         )
-    console.print(table)
+    with span("display_grades", "render"):
+        console.print(table)
+
+
+def diff_grades(previous: list[Grade], latest: list[Grade]) -> list[Grade]:
+    """找出新发布或有变化的成绩"""
+    saved = {grade.key: grade for grade in previous}
+    return [grade for grade in latest if saved.get(grade.key) != grade]
+
+
+def with_relogin(config: Config, func: Callable[[], T]) -> T:
+    """调用教务系统接口，Cookie 失效时重新登录后重试
+
+    Raises:
+        MaxRetriesError: 重新登录次数达到 max_retries 时抛出
+    """
+    retries = 0
+    while retries < config.max_retries:
+        try:
+            return func()
+        except CookieExpiredError:
+            get_cookies(config)
+            retries += 1
+    raise MaxRetriesError()
+
+
+def report_grades(fetch: Callable[[], list[Grade]], cache: Cache) -> list[Grade]:
+    """获取并显示全部成绩，高亮与上次获取相比新发布或有变化的成绩
+
+    获取失败时显示上次获取的成绩。
+
+    Returns:
+        list[Grade]: 显示的成绩
+    """
+    value = cache.get(GRADES_KEY, allow_expired=True)
+    previous = None if value is None else grades_adapter.validate_python(value)
+    try:
+        grades = fetch()
+    except (GetGradeError, DaemonError) as e:
+        if previous is None:
+            raise
+        console.print(f"{e}")
+        console.print("[yellow]获取成绩失败，显示上次获取的成绩")
+        display_grades(previous)
+        return previous
+
+    cache.set(GRADES_KEY, grades_adapter.dump_python(grades, mode="json"))
+    changed = diff_grades(previous, grades) if previous is not None else []
+    display_grades(grades, {grade.key for grade in changed})
+    message = f"[green]共 [white]{len(grades)} [green]门成绩"
+    if changed:
+        message += f"，新发布或有变化 [white]{len(changed)} [green]门"
+    console.print(message)
+    return grades
+
+
+def watch_grades(
+    fetch: Callable[[], list[Grade]],
+    probe: Callable[[], int],
+    cache: Cache,
+    grades: list[Grade],
+    interval: int,
+) -> None:
+    """持续检查成绩，只显示新发布或有变化的成绩
+
+    每次只获取成绩总数，总数变化时才获取全部成绩；
+    每 FULL_REFRESH_POLLS 次检查获取一次全部成绩，以发现已有成绩的修改。
+
+    Args:
+        fetch (Callable[[], list[Grade]]): 获取全部成绩的函数
+        probe (Callable[[], int]): 获取成绩总数的函数
+        cache (Cache)
+        grades (list[Grade]): 当前已知的成绩
+        interval (int): 检查间隔（秒）
+    """
+    console.print(f"[green]每 [white]{interval} [green]秒检查一次成绩，按 Ctrl+C 退出")
+    polls = 0
+    while True:
+        time.sleep(interval)
+        polls += 1
+        try:
+            if probe() == len(grades) and polls % FULL_REFRESH_POLLS != 0:
+                continue
+            latest = fetch()
+        except (GetGradeError, DaemonError) as e:
+            console.print(f"{e}")
+            continue
+
+        changed = diff_grades(grades, latest)
+        grades = latest
+        cache.set(GRADES_KEY, grades_adapter.dump_python(grades, mode="json"))
+        if changed:
+            console.print(
+                f"[cyan]{datetime.now().strftime('%H:%M:%S')} "
+                f"[green]新发布或有变化的成绩 [white]{len(changed)} [green]门"
+            )
+            display_grades(changed)
 
 
 get_grades = run_spinning(Grade.get, description="Fetching Grades")
 
 
+def get_grades_with_daemon(daemon: DaemonClient) -> list[Grade]:
+    return grades_adapter.validate_python(daemon.call("grades"))
+
+
 @app.command(name="grade")
-def main() -> None:
+def main(
+    watch: Annotated[
+        bool, typer.Option("--watch", "-w", help="持续检查，只显示新发布或有变化的成绩")
+    ] = False,
+    interval: Annotated[
+        int, typer.Option("--interval", "-i", min=10, help="检查间隔（秒）")
+    ] = 300,
+    trace: TraceOption = None,
+    cprofile: CProfileOption = None,
+) -> None:
     """
     获取成绩
     """
+    enable_profiling(trace, cprofile)
+    cache = Cache(0)
+    daemon = connect()
+    if daemon is not None:
+        try:
+            with daemon:
+                fetch = partial(get_grades_with_daemon, daemon=daemon)
+                grades = report_grades(fetch, cache)
+                if watch:
+                    probe = partial(daemon.call, "grades", probe=True)
+                    watch_grades(fetch, probe, cache, grades, interval)
+        except (GetGradeError, DaemonError) as e:
+            console.print(f"{e}")
+            raise typer.Exit(code=1)
+        except KeyboardInterrupt:
+            console.print("\n正在退出...", style="yellow")
+        return
+
     config = load_config()
-    assert config.cookies is not None
-    retries = 0
+    check_cookies(config)
     try:
-        grades = None
-        while retries < config.max_retries and grades is None:
-            try:
-                grades = get_grades(config.cookies)
-            except CookieExpiredError:
-                get_cookies(config)
-                retries += 1
-        if grades is None:
-            raise MaxRetriesError()
-
-        display_grades(grades)
+        with JwClient(config, config.connections) as client:
+            fetch = partial(with_relogin, config, partial(get_grades, client))
+            grades = report_grades(fetch, cache)
+            if watch:
+                probe = partial(with_relogin, config, partial(Grade.get_total, client))
+                watch_grades(fetch, probe, cache, grades, interval)
+    except GetGradeError as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
     except MaxRetriesError:
         console.print("尝试次数已达最大限制", style="red")
         raise typer.Exit(code=1)
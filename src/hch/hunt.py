@@ -1,93 +1,578 @@
+import asyncio
 import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Coroutine, Iterator
 
+import httpx
 import typer
 from pydantic import ValidationError
 from rich.live import Live
-from rich.progress import track
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
 from rich.text import Text
 from typing_extensions import Annotated
 
+from .client import AsyncJwClient
 from .config import Config, load_config
 from .console import console
-from .course import Course
-from .error import CookieExpiredError, HuntCourseError, LoadCourseError
-from .spinning import get_cookies, run_spinning
+from .course import Course, group_courses, requeue_courses
+from .error import (
+    BaseHunterError,
+    CookieExpiredError,
+    DaemonError,
+    HuntCourseError,
+    LoadCourseError,
+)
+from .ipc import DaemonClient, connect
+from .scheduler import ClockOffset, calibrate, get_deadline, sleep_until
+from .paths import check_profile
+from .profiler import CProfileOption, TraceOption, span
+from .profiler import enable as enable_profiling
+from .session import keep_session, refresh_cookies
+from .spinning import get_cookies
+from .telemetry import get_event_log
+from .time_info import TimeInfo
+
+COUNTDOWN_INTERVAL = 0.1
+KEEPALIVE_INTERVAL = 2
+KEEPALIVE_MARGIN = 0.5
 
-retries = 0
 app = typer.Typer()
 
+current_profile: ContextVar[str | None] = ContextVar("current_profile", default=None)
+"""同时为多个档案抢课时，当前协程所属的档案"""
+log_sink: ContextVar[Callable[[str, str | None], None] | None] = ContextVar(
+    "log_sink", default=None
+)
+"""在守护进程中抢课时，抢课信息转发给客户端而不是打印"""
+
+
+class HuntResult(Enum):
+    SUCCESS = "success"
+    FAILED = "failed"
+    COOKIE_EXPIRED = "cookie_expired"
+
+
+def log(message: str, style: str | None = None) -> None:
+    """打印抢课信息，多档案抢课时加上档案名前缀"""
+    profile = current_profile.get()
+    if profile is not None:
+        message = f"[magenta]\\[{profile}][/magenta] {message}"
+    sink = log_sink.get()
+    if sink is not None:
+        sink(message, style)
+        return
+    console.print(message, style=style)
+
+
+def is_interactive() -> bool:
+    """是否在终端前台为单个档案抢课，只有此时才显示动画与倒计时"""
+    return current_profile.get() is None and log_sink.get() is None
+
 
-def wait_until(target_time: datetime) -> None:
-    """倒计时等待至指定时间
+@contextmanager
+def spinner(description: str) -> Iterator[None]:
+    """显示加载动画，多档案抢课或在守护进程中抢课时不显示"""
+    if not is_interactive():
+        yield
+        return
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console,
+        transient=True,
+    ) as progress:
+        progress.add_task(description)
+        yield
+
+
+async def wait_until(deadline: float) -> float:
+    """倒计时等待至指定时刻
 
     Args:
-        target_time (datetime): 目标开始时间
+        deadline (float): time.perf_counter() 时间轴上的发送时刻
+
+    Returns:
+        float: 实际唤醒时刻与 deadline 之差（秒）
     """
+    if not is_interactive():
+        return await sleep_until(deadline)
 
     def remaining_time():
         text = Text()
         text.append("剩余 ", style="cyan")
-        text.append(
-            f"{int((target_time - datetime.now()).total_seconds())} ", style="white"
-        )
+        text.append(f"{int(deadline - time.perf_counter())} ", style="white")
         text.append("秒", style="cyan")
         return text
 
     with Live(remaining_time(), console=console, transient=True) as live:
-        while True:
-            if datetime.now() > target_time:
-                break
-
-            time.sleep(0.1)
+        while deadline - time.perf_counter() > COUNTDOWN_INTERVAL:
+            await asyncio.sleep(COUNTDOWN_INTERVAL)
             live.update(remaining_time())
 
+    return await sleep_until(deadline)
+
+
+async def calibrate_clock(
+    client: AsyncJwClient, probes: int, stop: float
+) -> ClockOffset | None:
+    """在截止时刻前校准服务器时钟并打印结果
+
+    校准不会推迟发送时刻：时间不足时提前结束，只使用已完成的探测。
 
-def hunt_courses(pending_courses: list[Course], config: Config, wait_time: int) -> None:
-    """执行选课流程
+    Args:
+        client (AsyncJwClient)
+        probes (int): 最多探测次数，为 0 时不校准
+        stop (float): time.perf_counter() 时间轴上的截止时刻
+
+    Returns:
+        ClockOffset | None: 校准结果，未校准或校准失败时返回 None
+    """
+    if probes == 0:
+        return None
+    if stop <= time.perf_counter():
+        log("距离目标时间太近，跳过时钟校准，将使用本地时间", style="yellow")
+        return None
+
+    with spinner("Calibrating Clock"), span("calibrate", "network"):
+        clock_offset = await calibrate(client, probes, stop)
+
+    if clock_offset is None:
+        log("时钟校准失败，将使用本地时间", style="yellow")
+        return None
+    if clock_offset.probes < probes:
+        log(
+            f"时间不足，时钟校准在 {clock_offset.probes}/{probes} 次探测后提前结束",
+            style="yellow",
+        )
+    log(
+        f"[cyan]服务器时钟偏差: [white]{clock_offset.offset * 1000:+.1f} ms "
+        f"(±{clock_offset.uncertainty * 1000:.1f} ms)[cyan]，"
+        f"单程延迟: [white]{clock_offset.latency * 1000:.1f} ms"
+    )
+    return clock_offset
+
+
+async def prearm(
+    client: AsyncJwClient,
+    pending_courses: list[Course],
+    armed_requests: dict[str, httpx.Request],
+    config: Config,
+    deadline: float,
+) -> None:
+    """在目标时间前预热连接并预先构造选课请求
+
+    从目标时间前 prearm_time 秒开始，建立 connections 个长连接并定期保活，
+    同时为每门待抢课程构造好选课请求，到点后只需直接发送。
+    保活在目标时间前 KEEPALIVE_MARGIN 秒停止，届时仍未返回的保活请求会被取消。
+    期间重新登录导致 Cookie 变化时会重新构造请求；保活停止后才重新登录的，
+    发送时由 hunt_course 发现 Cookie 不一致并即时构造。
 
     Args:
-        courses (list[Course]): 要选择的课程列表
+        client (AsyncJwClient)
+        pending_courses (list[Course]): 待抢课程列表
+        armed_requests (dict[str, httpx.Request]): 课程 ID 到预构造请求的映射
         config (Config)
-        wait_time (int): 每次尝试选课之间的等待时间（秒）
+        deadline (float): time.perf_counter() 时间轴上的发送时刻
+    """
+    await asyncio.sleep(max(deadline - config.prearm_time - time.perf_counter(), 0))
+
+    armed_cookies = None
+    # 到点前留出余量，避免保活请求占用连接
+    while (remaining := deadline - time.perf_counter()) > KEEPALIVE_MARGIN:
+        if config.cookies != armed_cookies:
+            armed_cookies = config.cookies
+            for course in pending_courses:
+                armed_requests[course.id] = course.build_hunt_request(client)
+        # 保活请求必须在余量之前结束，否则到点时被取消会关闭连接池中的连接
+        try:
+            await asyncio.wait_for(
+                client.warm_up(config.connections), remaining - KEEPALIVE_MARGIN
+            )
+        except TimeoutError:
+            return
+        remaining = deadline - time.perf_counter()
+        await asyncio.sleep(
+            max(min(KEEPALIVE_INTERVAL, remaining - KEEPALIVE_MARGIN), 0)
+        )
+
+
+async def hunt_course(
+    course: Course,
+    client: AsyncJwClient,
+    request: httpx.Request | None,
+) -> HuntResult:
+    """尝试选择单门课程
+
+    并发数与请求速率由 client 的限流器控制。
+    选上后立即从档案的待抢列表中移除，即使进程随后崩溃，下次运行也不会重复选课。
+
+    Args:
+        course (Course): 要选择的课程
+        client (AsyncJwClient)
+        request (httpx.Request | None): 预先构造的选课请求，Cookie 已变化时不使用
+
+    Returns:
+        HuntResult: 选课结果
     """
-    assert config.cookies is not None
-    unsuccessful_courses: list[Course] = []
-    num_courses = len(pending_courses)
-    index = 0
-    global retries
+    if request is not None and request.headers.get("Cookie") != (
+        client.config.cookies or ""
+    ):
+        # 预构造之后重新登录过，使用旧 Cookie 的请求必然失败，改为即时构造
+        request = None
     try:
-        while index < num_courses:
-            if retries == config.max_retries:
-                break
-            course = pending_courses[index]
-            try:
-                console.print()
-                hunt_spinning = run_spinning(
-                    course.hunt, description=f"Hunting: [cyan]{course.name}"
+        with span("Course.hunt", "network", course=course.name, armed=bool(request)):
+            await course.hunt_async(client, request)
+        # 写入状态库可能等待其它进程的锁，不能阻塞其余正在发送的选课请求
+        await asyncio.to_thread(course.mark_hunted, client.config.app_dir)
+        log(f"[green]选课成功：[white]{course.name}")
+        return HuntResult.SUCCESS
+    except CookieExpiredError:
+        return HuntResult.COOKIE_EXPIRED
+    except HuntCourseError as e:
+        log(f"[red]选课失败：[cyan]{course.name}")
+        log(f"{e}")
+        return HuntResult.FAILED
+
+
+async def hunt_group(
+    courses: list[Course],
+    client: AsyncJwClient,
+    armed_requests: dict[str, httpx.Request],
+) -> list[HuntResult]:
+    """按优先级依次尝试同一组中的课程
+
+    前一门失败后立即尝试下一门备选，中间不等待；
+    任意一门选上或 Cookie 过期即停止，其余备选不再发送请求。
+
+    Args:
+        courses (list[Course]): 同组课程，按优先级排列
+        client (AsyncJwClient)
+        armed_requests (dict[str, httpx.Request]): 预构造的选课请求，使用后移除
+
+    Returns:
+        list[HuntResult]: 已尝试课程的选课结果，最后一项为整组的结果
+    """
+    results: list[HuntResult] = []
+    for course in courses:
+        result = await hunt_course(course, client, armed_requests.pop(course.id, None))
+        results.append(result)
+        if result is not HuntResult.FAILED:
+            break
+    return results
+
+
+async def hunt_courses(
+    client: AsyncJwClient,
+    pending_courses: list[Course],
+    armed_requests: dict[str, httpx.Request],
+    config: Config,
+    succeeded: list[tuple[Course, list[Course]]],
+) -> bool:
+    """并发执行一轮选课流程
+
+    同时为所有待抢课程发送选课请求，并发数与速率由 client 的限流器自适应控制。
+    同一备选分组内的课程依次尝试，选上一门后同组其余课程一并移除。
+    选课成功的课程会从 pending_courses 中移除，其余课程留待下一轮。
+
+    Args:
+        client (AsyncJwClient)
+        pending_courses (list[Course]): 待抢课程列表
+        armed_requests (dict[str, httpx.Request]): 预构造的选课请求，使用后移除
+        config (Config)
+        succeeded (list[tuple[Course, list[Course]]]): 本轮选课成功的课程及其所在分组，
+            由本函数追加
+
+    Returns:
+        bool: 本轮是否出现失败或 Cookie 过期
+    """
+    groups = group_courses(pending_courses)
+    with spinner(f"Hunting: [cyan]{len(pending_courses)} [white]门课程"):
+        group_results = await asyncio.gather(
+            *(hunt_group(group, client, armed_requests) for group in groups)
+        )
+
+    results = [group_result[-1] for group_result in group_results]
+    for group, group_result, result in zip(groups, group_results, results):
+        if result is not HuntResult.SUCCESS:
+            continue
+        succeeded.append((group[len(group_result) - 1], group))
+        for course in group:
+            pending_courses.remove(course)
+            armed_requests.pop(course.id, None)
+        if len(group) > 1:
+            log(f"[cyan]已选上 [white]{group[-1].group} [cyan]组，取消其余备选")
+
+    if HuntResult.COOKIE_EXPIRED in results:
+        log("Cookie 过期，尝试重新获取", style="yellow")
+        await refresh_cookies(config, log)
+        armed_requests.clear()
+    return any(result is not HuntResult.SUCCESS for result in results)
+
+
+class Reconciler:
+    """每轮选课后与教务系统的已选课程列表核对结果
+
+    选课接口返回成功并不代表一定选上，超时或报错的请求也可能已经生效。
+    每轮只请求一次已选课程列表，按课程 ID 核对：实际已选上的待抢课程移出待抢列表，
+    返回成功但未选上的课程放回待抢列表，在下一轮重新选课。
+    """
+
+    def __init__(self, client: AsyncJwClient) -> None:
+        self.client = client
+        self.time_info: TimeInfo | None = None
+        """第一次核对时获取的学年学期信息"""
+
+    async def get_enrolled_ids(self) -> set[str] | None:
+        """获取已选课程的 ID，出错时返回 None"""
+        # 已选课程的解析依赖 selectolax，只在核对时导入
+        from .list.hunted import get_hunted_courses_async
+
+        try:
+            with span("get_hunted_courses", "network"):
+                if self.time_info is None:
+                    self.time_info = await TimeInfo.get_async(self.client)
+                courses = await get_hunted_courses_async(self.client, self.time_info)
+        except BaseHunterError as e:
+            log("[yellow]无法获取已选课程，跳过本轮核对")
+            if str(e):
+                log(f"{e}")
+            return None
+        return {course.id for course in courses}
+
+    async def reconcile(
+        self,
+        pending_courses: list[Course],
+        succeeded: list[tuple[Course, list[Course]]],
+    ) -> bool:
+        """核对本轮选课结果
+
+        Args:
+            pending_courses (list[Course]): 待抢课程列表，核对后就地更新
+            succeeded (list[tuple[Course, list[Course]]]): 本轮选课成功的课程及其分组
+
+        Returns:
+            bool: 是否有课程被放回待抢列表
+        """
+        enrolled_ids = await self.get_enrolled_ids()
+        if enrolled_ids is None:
+            return False
+
+        app_dir = self.client.config.app_dir
+        for group in group_courses(pending_courses):
+            course = next((c for c in group if c.id in enrolled_ids), None)
+            if course is None:
+                continue
+            await asyncio.to_thread(course.mark_hunted, app_dir)
+            for pending_course in group:
+                pending_courses.remove(pending_course)
+            log(f"[green]核对发现已选上：[white]{course.name}")
+
+        requeued = False
+        for course, group in succeeded:
+            if any(c.id in enrolled_ids for c in group):
+                continue
+            await asyncio.to_thread(requeue_courses, group, app_dir)
+            pending_courses[:0] = group
+            requeued = True
+            log(
+                f"[yellow]核对发现未选上：[white]{course.name}[yellow]，重新加入待抢列表"
+            )
+        return requeued
+
+
+async def hunt(
+    pending_courses: list[Course],
+    config: Config,
+    wait_time: int,
+    concurrency: int,
+    target_time: datetime | None,
+    client: AsyncJwClient | None = None,
+) -> None:
+    """等待至目标时间并执行选课流程
+
+    Args:
+        pending_courses (list[Course]): 待抢课程列表
+        config (Config)
+        wait_time (int): 一轮失败后重试前的等待时间（秒）
+        concurrency (int): 每个接口的初始并发上限，之后随服务器响应情况调整
+        target_time (datetime | None): 目标开始时间，为空时立即开始
+        client (AsyncJwClient | None): 复用的客户端，例如守护进程中保持预热的连接池，
+            用完后不会关闭；为空时新建客户端
+    """
+    max_connections = max(concurrency, config.max_concurrency, config.connections)
+    armed_requests: dict[str, httpx.Request] = {}
+    firing_error = None
+    event_log = get_event_log(config)
+    async with (
+        AsyncJwClient(config, max_connections, concurrency)
+        if client is None
+        else nullcontext(client)
+    ) as client:
+        if target_time is not None:
+            log(f"[cyan]计划开始时间: [white]{target_time.strftime('%H:%M:%S')}")
+            # 先按本地时钟估计发送时刻，校准必须在预热开始前结束
+            deadline = get_deadline(target_time, None)
+            clock_offset = await calibrate_clock(
+                client, config.clock_probes, deadline - config.prearm_time
+            )
+            deadline = get_deadline(target_time, clock_offset)
+            if event_log is not None:
+                event_log.record(
+                    "deadline",
+                    at=deadline,
+                    target=target_time.isoformat(),
+                    clock_offset=clock_offset and clock_offset.offset,
                 )
-                hunt_spinning(config.cookies)
-                console.print(f"[green]选课成功：[white]{course.name}")
-                index += 1
-            except CookieExpiredError:
-                console.print("Cookie 过期，尝试重新获取", style="yellow")
-                get_cookies(config)
-                retries += 1
-            except HuntCourseError as e:
-                console.print(f"[red]选课失败：[cyan]{course.name}")
-                console.print(f"{e}")
-                retries += 1
-                unsuccessful_courses.append(course)
-                index += 1
+            background_tasks = [
+                asyncio.create_task(
+                    prearm(client, pending_courses, armed_requests, config, deadline)
+                ),
+                asyncio.create_task(keep_session(client, config, deadline, log)),
+            ]
+            try:
+                with span("wait_until", "wait"):
+                    firing_error = await wait_until(deadline)
             finally:
-                if index < num_courses or unsuccessful_courses:
-                    for _ in track(range(wait_time * 10), description="Waiting..."):
-                        time.sleep(0.1)
+                for task in background_tasks:
+                    task.cancel()
+        if event_log is not None:
+            event_log.record("fire", firing_error=firing_error)
+        log("开始抢课", style="green")
+
+        reconciler = Reconciler(client)
+        retries = 0
+        while retries < config.max_retries and pending_courses:
+            succeeded: list[tuple[Course, list[Course]]] = []
+            failed = await hunt_courses(
+                client, pending_courses, armed_requests, config, succeeded
+            )
+            if await reconciler.reconcile(pending_courses, succeeded):
+                failed = True
+            if failed:
+                retries += 1
+                # 核对后可能已没有待抢课程，无需再等待
+                if retries < config.max_retries and wait_time > 0 and pending_courses:
+                    await asyncio.sleep(wait_time)
+
+    if firing_error is not None:
+        log(f"[cyan]触发误差: [white]{firing_error * 1000:.3f} ms")
+
+
+async def hunt_profile(
+    profile: str,
+    pending_courses: list[Course],
+    config: Config,
+    wait_time: int,
+    concurrency: int,
+    target_time: datetime | None,
+) -> None:
+    """在独立的会话中为单个档案执行选课流程"""
+    current_profile.set(profile)
+    if config.cookies is None and not await refresh_cookies(config, log):
+        return
+    await hunt(pending_courses, config, wait_time, concurrency, target_time)
+
+
+def hunt_profiles(
+    profiles: list[str],
+    is_immediate_hunt: bool,
+    wait_time: int | None,
+    concurrency: int | None,
+) -> None:
+    """在同一进程中同时为多个档案抢课
+
+    每个档案使用各自的配置、Cookie、课程列表与连接池，互不影响。
+    未在命令行指定的选项取各档案自己的配置。
+    """
+    jobs: list[tuple[str, Config, list[Course]]] = []
+    for profile in profiles:
+        check_profile(profile)
+        try:
+            pending_courses = Course.load(profile=profile)
+        except (LoadCourseError, ValidationError) as e:
+            console.print(f"[magenta]\\[{profile}][/magenta] {e}")
+            continue
+        jobs.append((profile, load_config(profile), pending_courses))
+    if not jobs:
+        raise typer.Exit(code=1)
+
+    totals = [len(pending_courses) for _, _, pending_courses in jobs]
+    try:
+        results = asyncio.run(
+            gather_profiles(
+                [
+                    hunt_profile(
+                        profile,
+                        pending_courses,
+                        config,
+                        config.wait_time if wait_time is None else wait_time,
+                        config.concurrency if concurrency is None else concurrency,
+                        None if is_immediate_hunt else config.target_time,
+                    )
+                    for profile, config, pending_courses in jobs
+                ]
+            )
+        )
+    except KeyboardInterrupt:
+        console.print("\n退出程序", style="yellow")
+        results = [None] * len(jobs)
     finally:
-        for i in range(index, num_courses):
-            unsuccessful_courses.append(pending_courses[i])
-        pending_courses.clear()
-        pending_courses.extend(unsuccessful_courses)
+        for _, config, _ in jobs:
+            config.save()
+
+    table = Table()
+    table.add_column("档案", style="magenta")
+    table.add_column("成功", style="green")
+    table.add_column("未成功", style="red")
+    table.add_column("错误", style="yellow")
+    for (profile, _, pending_courses), total, result in zip(jobs, totals, results):
+        table.add_row(
+            profile,
+            str(total - len(pending_courses)),
+            str(len(pending_courses)),
+            repr(result) if isinstance(result, BaseException) else "",
+        )
+    console.print(table)
+
+
+async def gather_profiles(
+    coroutines: list[Coroutine[Any, Any, None]],
+) -> list[BaseException | None]:
+    """同时运行所有档案，单个档案出错不影响其它档案"""
+    return await asyncio.gather(*coroutines, return_exceptions=True)
+
+
+def hunt_with_daemon(
+    daemon: DaemonClient,
+    is_immediate_hunt: bool,
+    wait_time: int | None,
+    concurrency: int | None,
+) -> None:
+    """由守护进程使用已登录的会话抢课，本进程只显示抢课信息
+
+    退出本进程时守护进程会取消抢课。
+    """
+    console.print("[cyan]由守护进程执行抢课")
+    try:
+        with daemon:
+            result = daemon.call(
+                "hunt",
+                now=is_immediate_hunt,
+                wait_time=wait_time,
+                concurrency=concurrency,
+            )
+    except DaemonError as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        console.print("\n退出程序", style="yellow")
+        return
+    if result["pending"]:
+        console.print("尝试次数已达最大限制", style="red")
 
 
 @app.command(name="hunt")
@@ -98,13 +583,47 @@ def main(
     wait_time: Annotated[
         int | None,
         typer.Option(
-            help="课程抢课间隔时间（秒），优先级高于配置文件", show_default=False
+            help="一轮失败后重试前的等待时间（秒），优先级高于配置文件",
+            show_default=False,
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int | None,
+        typer.Option(
+            "--concurrency",
+            "-c",
+            min=1,
+            help="初始并发请求数，之后根据服务器响应自动调整，优先级高于配置文件",
+            show_default=False,
         ),
     ] = None,
+    profiles: Annotated[
+        str | None,
+        typer.Option(
+            "--profiles",
+            help="同时为多个档案抢课，以逗号分隔，例如 a,b,c",
+            show_default=False,
+        ),
+    ] = None,
+    trace: TraceOption = None,
+    cprofile: CProfileOption = None,
 ) -> None:
     """
     抢课
     """
+    enable_profiling(trace, cprofile)
+    if profiles is not None:
+        names = [name.strip() for name in profiles.split(",") if name.strip()]
+        hunt_profiles(
+            list(dict.fromkeys(names)), is_immediate_hunt, wait_time, concurrency
+        )
+        return
+
+    daemon = connect()
+    if daemon is not None:
+        hunt_with_daemon(daemon, is_immediate_hunt, wait_time, concurrency)
+        return
+
     try:
         pending_courses = Course.load()
     except LoadCourseError as e:
@@ -121,17 +640,11 @@ def main(
             get_cookies(config)
         if wait_time is None:
             wait_time = config.wait_time
+        if concurrency is None:
+            concurrency = config.concurrency
 
-        target_time = config.target_time
-        if target_time and not is_immediate_hunt:
-            console.print(
-                f"[cyan]计划开始时间: [white]{target_time.strftime('%H:%M:%S')}"
-            )
-            wait_until(target_time)
-        console.print("开始抢课", style="green")
-
-        while retries < config.max_retries and pending_courses:
-            hunt_courses(pending_courses, config, wait_time)
+        target_time = None if is_immediate_hunt else config.target_time
+        asyncio.run(hunt(pending_courses, config, wait_time, concurrency, target_time))
 
         if pending_courses:
             console.print("尝试次数已达最大限制", style="red")
@@ -140,4 +653,3 @@ def main(
         console.print("\n退出程序", style="yellow")
     finally:
         config.save()
-        Course.save(pending_courses)
@@ -0,0 +1,112 @@
+import json
+import socket
+from pathlib import Path
+from typing import Any, Protocol, Self
+
+from .console import console
+from .error import DaemonError
+from .paths import get_app_dir
+
+SOCKET_FILE = "daemon.sock"
+
+
+def get_socket_path(app_dir: Path | None = None) -> Path:
+    """获取档案的守护进程套接字路径
+
+    Args:
+        app_dir (Path | None): 档案目录，为空时使用当前档案
+    """
+    if app_dir is None:
+        app_dir = get_app_dir()
+    return app_dir / SOCKET_FILE
+
+
+class Writer(Protocol):
+    """可写入字节的流，例如套接字的 makefile("wb")"""
+
+    def write(self, data: bytes, /) -> int: ...
+
+    def flush(self) -> None: ...
+
+
+class Reader(Protocol):
+    """可按行读取字节的流，例如套接字的 makefile("rb")"""
+
+    def readline(self) -> bytes: ...
+
+
+def send_message(file: Writer, message: dict[str, Any]) -> None:
+    """发送一条消息，每条消息是一行 JSON"""
+    file.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    file.flush()
+
+
+def read_message(file: Reader) -> dict[str, Any] | None:
+    """读取一条消息，连接已关闭时返回 None"""
+    line = file.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class DaemonClient:
+    """守护进程的客户端
+
+    每次调用发送一条请求 {"method", "params"}，守护进程在返回
+    {"result"} 或 {"error"} 之前可以先发送任意条 {"log", "style"} 消息，
+    客户端收到后直接打印。
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.file = sock.makefile("rwb")
+
+    def call(self, method: str, **params: Any) -> Any:
+        """调用守护进程的方法
+
+        Raises:
+            DaemonError: 守护进程返回错误或连接中断时抛出
+        """
+        try:
+            send_message(self.file, {"method": method, "params": params})
+            while (message := read_message(self.file)) is not None:
+                if "log" in message:
+                    console.print(message["log"], style=message.get("style"))
+                elif "error" in message:
+                    raise DaemonError(message["error"])
+                else:
+                    return message.get("result")
+        except OSError as e:
+            raise DaemonError(f"[red]与守护进程的连接出错：{e!r}")
+        raise DaemonError("[red]守护进程已断开连接")
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def connect(app_dir: Path | None = None) -> DaemonClient | None:
+    """连接档案的守护进程
+
+    Args:
+        app_dir (Path | None): 档案目录，为空时使用当前档案
+
+    Returns:
+        DaemonClient | None: 守护进程未运行时返回 None
+    """
+    path = get_socket_path(app_dir)
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return DaemonClient(sock)
@@ -0,0 +1,46 @@
+import importlib
+
+import click
+import typer
+from typer.core import TyperCommand, TyperGroup
+
+
+class LazyGroup(TyperGroup):
+    """按需导入子命令的命令组
+
+    子类通过 lazy_commands 声明子命令名称到 (模块路径, 帮助信息) 的映射。
+    子命令模块只在执行该命令时才导入；显示帮助时只使用声明的帮助信息，
+    不会导入任何子命令模块。
+    """
+
+    lazy_commands: dict[str, tuple[str, str]] = {}
+    _is_formatting_help = False
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        commands = super().list_commands(ctx)
+        return [
+            *self.lazy_commands,
+            *(name for name in commands if name not in self.lazy_commands),
+        ]
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, help = self.lazy_commands[cmd_name]
+            if self._is_formatting_help:
+                return TyperCommand(name=cmd_name, help=help)
+
+            module = importlib.import_module(module_name)
+            app: typer.Typer = module.app
+            # 补全选项只属于顶层命令
+            app._add_completion = False
+            command = typer.main.get_command(app)
+            command.name = cmd_name
+            self.commands[cmd_name] = command
+        return super().get_command(ctx, cmd_name)
+
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        self._is_formatting_help = True
+        try:
+            super().format_help(ctx, formatter)
+        finally:
+            self._is_formatting_help = False
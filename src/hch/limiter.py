@@ -0,0 +1,114 @@
+import asyncio
+import math
+import time
+from enum import Enum
+
+MIN_RATE = 1
+RATE_INCREASE = 1
+SLOW_FACTOR = 3
+DECREASE_FACTOR = 0.5
+MIN_DECREASE_INTERVAL = 0.1
+THROTTLE_KEYWORDS = ("频繁", "繁忙", "稍后", "限流")
+
+
+class Outcome(Enum):
+    SUCCESS = "success"
+    """服务器正常处理了请求，包括业务上的失败，例如课程已满"""
+    OVERLOAD = "overload"
+    """服务器过载：5xx、429、超时、网络错误或限流提示"""
+    NEUTRAL = "neutral"
+    """与服务器负载无关的结果，例如 Cookie 失效或请求被取消"""
+
+
+def is_throttled(message: object) -> bool:
+    """判断服务器返回的消息是否为限流提示"""
+    return isinstance(message, str) and any(
+        keyword in message for keyword in THROTTLE_KEYWORDS
+    )
+
+
+class AdaptiveLimiter:
+    """单个接口的自适应限流器
+
+    同时限制并发数与请求速率，两者都按 AIMD 调整：
+    响应快且成功时并发上限每次增加 1/上限（约每轮增加 1），速率增加 RATE_INCREASE；
+    服务器过载时两者减半。同一批请求的多次过载只减半一次。
+    令牌桶容量等于最大并发数，空闲一段时间后可以立即发出一整批请求。
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_concurrency: int,
+        rate: float,
+        max_rate: float,
+    ) -> None:
+        """
+        Args:
+            concurrency (int): 初始并发上限
+            max_concurrency (int): 并发上限的最大值
+            rate (float): 初始速率（次/秒），0 表示不限制速率
+            max_rate (float): 速率的最大值
+        """
+        self.max_limit = max(max_concurrency, concurrency)
+        self.limit = float(concurrency)
+        self.max_rate = max(max_rate, rate)
+        self.rate = rate
+        self.tokens = float(self.max_limit)
+        self.in_flight = 0
+        self.min_latency = math.inf
+        self._updated = time.perf_counter()
+        self._last_decrease = -math.inf
+        self._changed = asyncio.Event()
+
+    def _refill(self) -> None:
+        now = time.perf_counter()
+        self.tokens = min(
+            self.tokens + (now - self._updated) * self.rate, self.max_limit
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """等待直到并发数与速率都允许发送下一个请求"""
+        while True:
+            self._refill()
+            has_slot = self.in_flight < max(int(self.limit), 1)
+            has_token = self.rate <= 0 or self.tokens >= 1
+            if has_slot and has_token:
+                self.tokens -= 1
+                self.in_flight += 1
+                return
+
+            timeout = None if not has_slot else (1 - self.tokens) / self.rate
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    def release(self, outcome: Outcome, latency: float | None = None) -> None:
+        """请求结束后归还并发名额，并根据结果调整限制
+
+        Args:
+            outcome (Outcome): 请求结果
+            latency (float | None): 请求耗时（秒），仅在成功时使用
+        """
+        self.in_flight -= 1
+        if outcome is Outcome.SUCCESS and latency is not None:
+            self.min_latency = min(self.min_latency, latency)
+            # 响应明显变慢说明服务器已接近极限，此时不再加速
+            if latency <= self.min_latency * SLOW_FACTOR:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+                if self.rate > 0:
+                    self.rate = min(self.rate + RATE_INCREASE, self.max_rate)
+        elif outcome is Outcome.OVERLOAD:
+            now = time.perf_counter()
+            interval = MIN_DECREASE_INTERVAL
+            if math.isfinite(self.min_latency):
+                interval = max(self.min_latency, interval)
+            if now - self._last_decrease > interval:
+                self._last_decrease = now
+                self.limit = max(self.limit * DECREASE_FACTOR, 1)
+                if self.rate > 0:
+                    self.rate = max(self.rate * DECREASE_FACTOR, MIN_RATE)
+        self._changed.set()
@@ -1,11 +1,20 @@
 import typer
 
-from .config import app as config_app
-from .hunted import app as hunted_app
-from .selected import app as selected_app
+from ..lazy import LazyGroup
 
-app = typer.Typer(name="list", help="查看信息")
 
-app.add_typer(config_app)
-app.add_typer(hunted_app)
-app.add_typer(selected_app)
+class ListGroup(LazyGroup):
+    lazy_commands = {
+        "config": ("hch.list.config", "列出配置"),
+        "hunted": ("hch.list.hunted", "列出已抢课程"),
+        "selected": ("hch.list.selected", "列出已选择的课程"),
+        "profiles": ("hch.list.profiles", "列出所有档案"),
+    }
+
+
+app = typer.Typer(name="list", help="查看信息", cls=ListGroup)
+
+
+@app.callback()
+def main() -> None:
+    pass
@@ -1,20 +1,34 @@
-import httpx
 import typer
+from pydantic import TypeAdapter, ValidationError
 from rich.table import Table
-from selectolax.parser import HTMLParser
 
+from ..client import AsyncJwClient, JwClient
 from ..config import load_config
 from ..console import console
-from ..course import Course
-from ..error import CookieExpiredError, GetHuntedCourseError, MaxRetriesError
-from ..login import get_headers
+from ..course import Course, courses_adapter
+from ..error import (
+    CookieExpiredError,
+    DaemonError,
+    GetHuntedCourseError,
+    MaxRetriesError,
+)
+from ..ipc import connect
 from ..spinning import check_cookies, get_cookies, get_time_info
 from ..time_info import TimeInfo
+from ..tools import CourseRow, information_parser
 
 app = typer.Typer()
 retries = 0
 
 
+class HuntedCourseRow(CourseRow):
+    xkfsdm: str
+    xksj: str
+
+
+hunted_rows_adapter = TypeAdapter(list[HuntedCourseRow])
+
+
 def display_hunted_courses(courses: list[Course]) -> None:
     table = Table()
     table.add_column("课程名称", style="cyan")
@@ -29,10 +43,8 @@ def display_hunted_courses(courses: list[Course]) -> None:
     console.print(table)
 
 
-def get_hunted_courses(time_info: TimeInfo, cookies: str) -> list[Course]:
-    headers = get_headers(cookies)
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryYxkc"
-    data = {
+def get_hunted_courses_data(time_info: TimeInfo) -> dict[str, str]:
+    return {
         "p_pylx": "1",
         "p_xn": time_info.academic_year,
         "p_xq": time_info.term,
@@ -41,39 +53,51 @@ def get_hunted_courses(time_info: TimeInfo, cookies: str) -> list[Course]:
         "p_xkfsdm": "yixuan",
     }
 
-    response = httpx.post(url, data=data, headers=headers, follow_redirects=True)
-    if response.status_code == 200:
-        if "application/json" in response.headers["Content-Type"]:
-            response_json = response.json()
-            try:
-                elements: list[dict[str, str]] = response_json["yxkcList"]
-                courses: list[Course] = []
-                for course in elements:
-                    tree = HTMLParser(course["kcxx"])
-                    information = tree.text(separator="\n")
-                    courses.append(
-                        Course(
-                            id=course["id"],
-                            name=course["kcmc"].strip() + course["tyxmmc"].strip(),
-                            information=information.strip(),
-                            code=course["xkfsdm"],
-                            academic_year=time_info.academic_year,
-                            term=time_info.term,
-                            capacity=course["zrl"],
-                            enrolled=course["yxzrs"],
-                            hunted_time=course["xksj"],
-                        )
-                    )
-                return courses
-            except KeyError:
-                message = response_json["message"]
-                raise GetHuntedCourseError(f"[red]课程信息获取失败：{message}")
-        elif "text/html" in response.headers["Content-Type"]:
-            raise CookieExpiredError()
-        else:
-            raise GetHuntedCourseError("[red]响应内容不是有效的 JSON 格式")
-    else:
-        raise GetHuntedCourseError(f"[red]请求失败，状态码：{response.status_code}")
+
+def get_hunted_courses(client: JwClient, time_info: TimeInfo) -> list[Course]:
+    """获取已选课程列表
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        GetHuntedCourseError: 有其它错误时抛出
+    """
+    data = get_hunted_courses_data(time_info)
+    response_json = client.post("/Xsxk/queryYxkc", GetHuntedCourseError, data=data)
+    return parse_hunted_courses(response_json, time_info)
+
+
+async def get_hunted_courses_async(
+    client: AsyncJwClient, time_info: TimeInfo
+) -> list[Course]:
+    """异步获取已选课程列表，参数与返回值同 get_hunted_courses"""
+    data = get_hunted_courses_data(time_info)
+    response_json = await client.post(
+        "/Xsxk/queryYxkc", GetHuntedCourseError, data=data
+    )
+    return parse_hunted_courses(response_json, time_info)
+
+
+def parse_hunted_courses(response_json: dict, time_info: TimeInfo) -> list[Course]:
+    try:
+        rows = hunted_rows_adapter.validate_python(response_json["yxkcList"])
+    except (KeyError, ValidationError):
+        message = response_json.get("message")
+        raise GetHuntedCourseError(f"[red]课程信息获取失败：{message}")
+
+    return [
+        Course(
+            id=row["id"],
+            name=row["kcmc"].strip() + row["tyxmmc"].strip(),
+            information=information_parser.parse(row["id"], row["kcxx"]),
+            code=row["xkfsdm"],
+            academic_year=time_info.academic_year,
+            term=time_info.term,
+            capacity=row["zrl"],
+            enrolled=row["yxzrs"],
+            hunted_time=row["xksj"],
+        )
+        for row in rows
+    ]
 
 
 @app.command(name="hunted")
@@ -81,22 +105,34 @@ def main():
     """
     列出已抢课程
     """
+    daemon = connect()
+    if daemon is not None:
+        try:
+            with daemon:
+                hunted_courses = courses_adapter.validate_python(daemon.call("hunted"))
+        except DaemonError as e:
+            console.print(f"{e}")
+            raise typer.Exit(code=1)
+        display_hunted_courses(hunted_courses)
+        return
+
     config = load_config()
     check_cookies(config)
     assert config.cookies is not None
     global retries
     try:
-        time_info = None
-        while retries < config.max_retries and not time_info:
-            try:
-                time_info = get_time_info(config.cookies)
-            except CookieExpiredError:
-                get_cookies(config)
-                retries += 1
-        if time_info is None:
-            raise MaxRetriesError()
-
-        hunted_courses = get_hunted_courses(time_info, config.cookies)
+        with JwClient(config) as client:
+            time_info = None
+            while retries < config.max_retries and not time_info:
+                try:
+                    time_info = get_time_info(client)
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if time_info is None:
+                raise MaxRetriesError()
+
+            hunted_courses = get_hunted_courses(client, time_info)
         display_hunted_courses(hunted_courses)
 
     except MaxRetriesError:
@@ -0,0 +1,31 @@
+import typer
+from rich.table import Table
+
+from ..config import Config
+from ..console import console
+from ..course import Course
+from ..error import LoadCourseError
+from .. import paths
+
+app = typer.Typer()
+
+
+@app.command(name="profiles")
+def main() -> None:
+    """
+    列出所有档案
+    """
+    current = paths.active_profile or paths.DEFAULT_PROFILE
+    table = Table()
+    table.add_column("档案", style="cyan")
+    table.add_column("用户名", style="magenta")
+    table.add_column("待抢课程数", style="green")
+    for profile in paths.list_profiles():
+        config = Config.load(profile=profile)
+        try:
+            courses = len(Course.load(profile=profile))
+        except LoadCourseError:
+            courses = 0
+        name = f"* {profile}" if profile == current else profile
+        table.add_row(name, config.username or "", str(courses))
+    console.print(table)
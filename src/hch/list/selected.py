@@ -13,8 +13,9 @@ def display_selected_courses(courses: list[Course]) -> None:
     table = Table(show_lines=True)
     table.add_column("课程名称", style="cyan", vertical="middle", justify="center")
     table.add_column("课程信息", style="magenta")
+    table.add_column("备选分组", style="yellow", vertical="middle", justify="center")
     for course in courses:
-        table.add_row(course.name, course.information)
+        table.add_row(course.name, course.information, course.group or "")
     console.print(table)
 
 
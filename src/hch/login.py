@@ -1,4 +1,5 @@
 import random
+import time
 from base64 import b64encode
 
 import httpx
@@ -7,9 +8,12 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad
 from selectolax.parser import HTMLParser
 
+from .cas import get_cas_cookies_path, load_cas_cookies, save_cas_cookies
 from .config import Config
 from .console import console
 from .error import GetCookieError
+from .profiler import traced
+from .telemetry import record_request
 
 AES_CHARS = "ABCDEFGHJKMNPQRSTWXYZabcdefhijkmnprstwxyz2345678"
 
@@ -73,7 +77,82 @@ def encrypt_password(password: str, salt: str) -> str:
     return encrypted_result
 
 
+def get_session_cookies(client: httpx.Client, config: Config) -> str | None:
+    """从登录后的 Cookie 中取出教务系统会话所需的 route 与 JSESSIONID"""
+    domain = httpx.URL(config.base_url).host
+    route = client.cookies.get("route", domain=domain)
+    jsessionid = client.cookies.get("JSESSIONID", domain=domain)
+    if jsessionid is None:
+        return None
+    return f"route={route}; JSESSIONID={jsessionid}"
+
+
+def save_cas_jar(client: httpx.Client, config: Config) -> None:
+    """保存统一身份认证域名下的全部 Cookie，包括 SSO 会话 CASTGC"""
+    domain = httpx.URL(config.cas_url).host
+    save_cas_cookies(
+        path=get_cas_cookies_path(config.app_dir),
+        cookies=[
+            {
+                "name": cookie.name,
+                "value": cookie.value or "",
+                "domain": cookie.domain,
+                "path": cookie.path,
+            }
+            for cookie in client.cookies.jar
+            if cookie.domain.lstrip(".") == domain
+        ],
+    )
+
+
+def get_event_hooks(config: Config) -> dict[str, list]:
+    """记录登录过程中每一跳请求（包括重定向）耗时的事件钩子"""
+
+    def on_request(request: httpx.Request) -> None:
+        request.extensions["start"] = time.perf_counter()
+
+    def on_response(response: httpx.Response) -> None:
+        request = response.request
+        record_request(
+            config,
+            request.method,
+            request.url.path,
+            request.extensions["start"],
+            response.status_code,
+        )
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def check_status(response: httpx.Response) -> None:
+    """检查登录过程中的响应，服务器出错时不应误报为用户名或密码错误
+
+    统一身份认证在密码错误时可能返回 4xx，因此只检查 5xx。
+
+    Raises:
+        GetCookieError: 服务器返回 5xx 时抛出
+    """
+    if response.is_server_error:
+        raise GetCookieError(f"[red]服务器错误：{response.status_code} {response.url}")
+
+
+@traced("login", "network")
 def get_cookies(config: Config) -> str:
+    """登录教务系统并获取 Cookie
+
+    优先使用保存的统一身份认证 SSO 会话：请求登录页时若 CASTGC 仍然有效，
+    服务器会直接重定向回教务系统，一次请求即可完成登录；
+    否则服务器返回登录页，继续使用账号密码登录。
+
+    Args:
+        config (Config)
+
+    Returns:
+        str: 教务系统 Cookie
+
+    Raises:
+        GetCookieError: 登录失败时抛出
+    """
     username = config.username
     password = config.password
 
@@ -85,16 +164,37 @@ def get_cookies(config: Config) -> str:
         password = typer.prompt("请输入校园网账号密码", hide_input=True)
         config.password = password
 
-    with httpx.Client(follow_redirects=True) as client:
-        response = client.get(
-            "https://ids.hit.edu.cn/authserver/login",
-            params={"service": "http://jw.hitsz.edu.cn/casLogin"},
+    login_url = f"{config.cas_url}/authserver/login"
+    service = f"{config.base_url}/casLogin"
+    cas_cookies = httpx.Cookies()
+    for cookie in load_cas_cookies(get_cas_cookies_path(config.app_dir)):
+        cas_cookies.set(
+            cookie["name"], cookie["value"], cookie["domain"], cookie["path"]
         )
+    # 教务系统会话 Cookie 必须由本次登录重新获得，否则无法判断 SSO 是否成功
+    for name in ("route", "JSESSIONID"):
+        cas_cookies.delete(name, domain=httpx.URL(config.base_url).host)
+
+    with httpx.Client(
+        follow_redirects=True,
+        cookies=cas_cookies,
+        event_hooks=get_event_hooks(config),
+    ) as client:
+        try:
+            response = client.get(login_url, params={"service": service})
+        except httpx.HTTPError as e:
+            raise GetCookieError(f"[red]网络错误：{e!r}")
+        check_status(response)
 
         tree = HTMLParser(response.text)
 
         selector = "div#pwdLoginDiv"
         node = tree.css_first(selector)
+        if node is None and (cookies := get_session_cookies(client, config)):
+            save_cas_jar(client, config)
+            config.cookies = cookies
+            console.print("[green]成功获取 Cookies")
+            return cookies
         if node is None:
             raise GetCookieError(f"找不到匹配选择器 '{selector}' 的元素")
 
@@ -139,42 +239,29 @@ def get_cookies(config: Config) -> str:
         execution = execution_node.attributes["value"]
 
         encrypted_password = encrypt_password(password, salt)
-        client.post(
-            "https://ids.hit.edu.cn/authserver/login",
-            params={"service": "http://jw.hitsz.edu.cn/casLogin"},
-            data={
-                "username": username,
-                "password": encrypted_password,
-                "captcha": "",
-                "_eventId": event_id,
-                "cllt": cllt,
-                "dllt": dllt,
-                "lt": lt,
-                "execution": execution,
-            },
-        )
-        route = client.cookies.get("route", domain="jw.hitsz.edu.cn")
-        jsessionid = client.cookies.get("JSESSIONID", domain="jw.hitsz.edu.cn")
-        cookies = f"route={route}; JSESSIONID={jsessionid}"
+        try:
+            response = client.post(
+                login_url,
+                params={"service": service},
+                data={
+                    "username": username,
+                    "password": encrypted_password,
+                    "captcha": "",
+                    "_eventId": event_id,
+                    "cllt": cllt,
+                    "dllt": dllt,
+                    "lt": lt,
+                    "execution": execution,
+                },
+            )
+        except httpx.HTTPError as e:
+            raise GetCookieError(f"[red]网络错误：{e!r}")
+        check_status(response)
+        cookies = get_session_cookies(client, config)
+        if cookies is None:
+            raise GetCookieError("[red]登录失败，请检查用户名与密码")
+        save_cas_jar(client, config)
         config.cookies = cookies
 
     console.print("[green]成功获取 Cookies")
     return cookies
-
-
-def get_headers(cookies: str) -> dict[str, str]:
-    """生成 HTTP 请求头
-
-    根据提供的 Cookie 构造 HTTP 请求头字典。
-    使用预设的 User-Agent 确保请求行为与浏览器一致。
-
-    Args:
-        cookies (str): 用于身份验证的Cookie字符串
-
-    Returns:
-        dict[str, str]: 包含 User-Agent 和 Cookie 的请求头字典:
-    """
-    return {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0",
-        "Cookie": cookies,
-    }
@@ -1,16 +1,42 @@
 import typer
+from typing_extensions import Annotated
 
-from .change import app as change_app
-from .hunt import app as hunt_app
-from .list import app as list_app
-from .select import app as select_app
-from .set import app as set_app
-from .grade import app as grade_app
+from . import paths
+from .lazy import LazyGroup
 
-app = typer.Typer(help="Awesome HITSZ course hunter.")
-app.add_typer(hunt_app)
-app.add_typer(select_app)
-app.add_typer(set_app)
-app.add_typer(list_app)
-app.add_typer(change_app)
-app.add_typer(grade_app)
+
+class MainGroup(LazyGroup):
+    lazy_commands = {
+        "hunt": ("hch.hunt", "抢课"),
+        "watch": ("hch.watch", "监视余量并自动选课"),
+        "select": ("hch.select", "选择课程"),
+        "set": ("hch.set", "修改配置"),
+        "list": ("hch.list", "查看信息"),
+        "change": ("hch.change", "更改已选择的课程"),
+        "grade": ("hch.grade", "获取成绩"),
+        "cache": ("hch.cache", "管理缓存"),
+        "catalog": ("hch.catalog", "离线课程目录"),
+        "stats": ("hch.stats", "统计请求记录"),
+        "daemon": ("hch.daemon", "后台常驻服务"),
+        "simulator": ("hch.simulator", "启动本地模拟教务系统"),
+    }
+
+
+app = typer.Typer(cls=MainGroup, help="Awesome HITSZ course hunter.")
+
+
+@app.callback()
+def main(
+    profile: Annotated[
+        str | None,
+        typer.Option(
+            "--profile",
+            "-p",
+            envvar="HCH_PROFILE",
+            callback=paths.check_profile,
+            help="使用指定档案的配置、Cookie 与课程，默认为 default",
+            show_default=False,
+        ),
+    ] = None,
+) -> None:
+    paths.active_profile = profile
@@ -0,0 +1,41 @@
+import re
+from pathlib import Path
+
+import typer
+
+DEFAULT_PROFILE = "default"
+PROFILE_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+active_profile: str | None = None
+"""当前命令使用的档案，由顶层 --profile 选项设置"""
+
+
+def get_app_dir(profile: str | None = None) -> Path:
+    """获取档案的数据目录
+
+    默认档案使用应用目录本身，与引入档案之前的数据位置保持一致；
+    其它档案位于应用目录下的 profiles/<名称>。
+
+    Args:
+        profile (str | None): 档案名称，为空时使用当前档案
+    """
+    if profile is None:
+        profile = active_profile
+    app_dir = Path(typer.get_app_dir("hch"))
+    if profile is None or profile == DEFAULT_PROFILE:
+        return app_dir
+    return app_dir / "profiles" / profile
+
+
+def list_profiles() -> list[str]:
+    profiles_dir = Path(typer.get_app_dir("hch")) / "profiles"
+    profiles = [DEFAULT_PROFILE]
+    if profiles_dir.exists():
+        profiles.extend(sorted(path.name for path in profiles_dir.iterdir()))
+    return profiles
+
+
+def check_profile(profile: str | None) -> str | None:
+    if profile is not None and not PROFILE_PATTERN.fullmatch(profile):
+        raise typer.BadParameter("档案名称只能包含字母、数字、下划线与连字符")
+    return profile
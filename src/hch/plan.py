@@ -0,0 +1,244 @@
+import asyncio
+import sys
+import tomllib
+from pathlib import Path
+from typing import Callable
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
+
+from .cache import Cache, course_key
+from .client import AsyncJwClient
+from .config import Config
+from .console import console
+from .course import Course, courses_adapter
+from .error import BaseHunterError, CookieExpiredError, LoadPlanError
+from .time_info import TimeInfo
+from .tools import get_courses_async
+
+
+class PlanEntry(BaseModel):
+    """选课计划中的一项
+
+    在 category 类别下以 keyword 搜索，保留课程信息同时包含 teacher 与 time 的课程；
+    ids 不为空时只保留其中的课程。
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    category: str
+    """类别名称或代码"""
+    keyword: str = ""
+    teacher: str | None = None
+    time: str | None = None
+    ids: list[str] = []
+    group: str | None = None
+    """匹配到的课程作为同一组备选，按服务器返回的顺序排列优先级"""
+    limit: int | None = Field(default=None, ge=1)
+    """最多保留几门课程"""
+
+    def match(self, course: Course) -> bool:
+        if self.ids and course.id not in self.ids:
+            return False
+        if self.teacher is not None and self.teacher not in course.information:
+            return False
+        if self.time is not None and self.time not in course.information:
+            return False
+        return True
+
+
+class Plan(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    courses: list[PlanEntry] = Field(alias="course")
+
+
+def load_plan(source: str) -> Plan:
+    """读取 TOML 格式的选课计划
+
+    Args:
+        source (str): 文件路径，为 - 时从标准输入读取
+
+    Raises:
+        LoadPlanError: 文件不存在或格式错误时抛出
+    """
+    try:
+        if source == "-":
+            data = tomllib.loads(sys.stdin.read())
+        else:
+            data = tomllib.loads(Path(source).read_text(encoding="utf-8"))
+        return Plan.model_validate(data)
+    except OSError as e:
+        raise LoadPlanError(f"[red]无法读取选课计划：{e}")
+    except (tomllib.TOMLDecodeError, ValidationError) as e:
+        raise LoadPlanError(f"[red]选课计划格式错误：{e}")
+
+
+def resolve_categories(
+    plan: Plan, categories: list[dict[str, str]]
+) -> list[dict[str, str]]:
+    """找出计划中每一项对应的课程类别
+
+    Raises:
+        LoadPlanError: 有类别不存在时抛出
+    """
+    lookup = {category["code"]: category for category in categories}
+    lookup.update({category["name"]: category for category in categories})
+    result = []
+    for entry in plan.courses:
+        if entry.category not in lookup:
+            names = "、".join(category["name"] for category in categories)
+            raise LoadPlanError(
+                f"[red]找不到课程类别 [white]{entry.category}[red]，可选类别：{names}"
+            )
+        result.append(lookup[entry.category])
+    return result
+
+
+async def search(
+    client: AsyncJwClient,
+    cache: Cache,
+    key: str,
+    category: dict[str, str],
+    keyword: str,
+    time_info: TimeInfo,
+) -> list[Course]:
+    """搜索课程并写入缓存，服务器出错时回退到已过期的缓存"""
+    try:
+        courses = await get_courses_async(client, category, time_info, keyword)
+    except CookieExpiredError:
+        raise
+    except BaseHunterError as e:
+        value = cache.get(key, allow_expired=True)
+        if value is None:
+            raise
+        console.print(f"{e}")
+        console.print(f"[yellow]{category['name']} {keyword} 使用已过期的缓存")
+        return courses_adapter.validate_python(value)
+    cache.set(key, courses_adapter.dump_python(courses, mode="json"))
+    return courses
+
+
+async def search_all(
+    config: Config,
+    cache: Cache,
+    queries: list[tuple[dict[str, str], str]],
+    time_info: TimeInfo,
+) -> list[list[Course]]:
+    """并发执行所有搜索，未过期的缓存直接使用，搜索结果写入缓存
+
+    Args:
+        queries (list[tuple[dict[str, str], str]]): (课程类别, 关键词) 列表
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        GetCourseError: 有其它错误时抛出
+    """
+    keys = [
+        course_key(time_info.academic_year, time_info.term, category["code"], keyword)
+        for category, keyword in queries
+    ]
+    results: list[list[Course] | None] = []
+    for key in keys:
+        value = cache.get(key)
+        results.append(
+            None if value is None else courses_adapter.validate_python(value)
+        )
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if missing:
+        max_connections = max(config.concurrency, config.max_concurrency)
+        async with AsyncJwClient(config, max_connections) as client:
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console,
+                transient=True,
+            ) as progress:
+                progress.add_task(f"Searching: [cyan]{len(missing)} [white]个搜索")
+                fetched = await asyncio.gather(
+                    *(
+                        search(client, cache, keys[i], *queries[i], time_info)
+                        for i in missing
+                    )
+                )
+        for i, courses in zip(missing, fetched):
+            results[i] = courses
+
+    return [result for result in results if result is not None]
+
+
+def resolve_plan(
+    plan: Plan,
+    categories: list[dict[str, str]],
+    selected_courses: list[Course],
+    search: Callable[[list[tuple[dict[str, str], str]]], list[list[Course]]],
+) -> list[Course]:
+    """按计划搜索课程，返回需要加入待抢列表的课程
+
+    相同类别与关键词的项只搜索一次，所有搜索交给 search 一次并发执行。
+    按计划中的顺序合并结果，同一门课程只保留第一次出现，已在待抢列表中的课程跳过。
+
+    Args:
+        plan (Plan)
+        categories (list[dict[str, str]]): 课程类别列表
+        selected_courses (list[Course]): 已在待抢列表中的课程
+        search (Callable): 并发执行 (课程类别, 关键词) 列表中所有搜索的函数
+
+    Raises:
+        LoadPlanError: 有类别不存在时抛出
+    """
+    entry_categories = resolve_categories(plan, categories)
+    queries: dict[tuple[str, str], tuple[dict[str, str], str]] = {}
+    for entry, category in zip(plan.courses, entry_categories):
+        queries.setdefault((category["code"], entry.keyword), (category, entry.keyword))
+    results = dict(zip(queries, search(list(queries.values()))))
+
+    seen = {course.id for course in selected_courses}
+    added: list[Course] = []
+    for i, (entry, category) in enumerate(zip(plan.courses, entry_categories)):
+        matched = [
+            course
+            for course in results[(category["code"], entry.keyword)]
+            if entry.match(course)
+        ][: entry.limit]
+        description = f"{category['name']} {entry.keyword}".strip()
+        if not matched:
+            console.print(
+                f"[yellow]第 {i + 1} 项 [white]{description} [yellow]未找到课程"
+            )
+            continue
+        missing_ids = set(entry.ids) - {course.id for course in matched}
+        if missing_ids:
+            console.print(
+                f"[yellow]第 {i + 1} 项 [white]{description} [yellow]未找到课程 "
+                f"{'、'.join(sorted(missing_ids))}"
+            )
+
+        new = [course for course in matched if course.id not in seen]
+        for course in new:
+            course.group = entry.group
+            seen.add(course.id)
+        added.extend(new)
+        console.print(
+            f"[green]第 {i + 1} 项 [white]{description}[green]：匹配 "
+            f"[white]{len(matched)} [green]门，新增 [white]{len(new)} [green]门"
+        )
+    return added
+
+
+def display_added(courses: list[Course]) -> None:
+    table = Table()
+    table.add_column("课程名称", style="cyan")
+    table.add_column("课程信息", style="magenta")
+    table.add_column("分组")
+    table.add_column("已选人数/总容量", style="yellow")
+    for course in courses:
+        table.add_row(
+            course.name,
+            course.information.replace("\n", " "),
+            course.group or "",
+            f"{course.enrolled}/{course.capacity}",
+        )
+    console.print(table)
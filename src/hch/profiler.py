@@ -0,0 +1,193 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, ContextManager, ParamSpec, TypeVar
+
+import typer
+from typing_extensions import Annotated
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+_NULL_SPAN = nullcontext()
+
+TraceOption = Annotated[
+    Path | None,
+    typer.Option(
+        "--trace",
+        dir_okay=False,
+        help="将各阶段耗时写入 Chrome trace 文件，可用 Perfetto 打开",
+        show_default=False,
+    ),
+]
+CProfileOption = Annotated[
+    Path | None,
+    typer.Option(
+        "--cprofile",
+        dir_okay=False,
+        help="将 cProfile 统计写入文件，可用 snakeviz 等工具查看",
+        show_default=False,
+    ),
+]
+
+
+class Tracer:
+    """收集各阶段的耗时，导出为 Chrome trace 格式
+
+    每个线程与每个 asyncio 任务分别占一行，并发的请求不会相互重叠。
+    生成的文件可以用 https://ui.perfetto.dev 或 chrome://tracing 打开。
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.events: list[dict[str, Any]] = []
+        self._tids: dict[tuple[int, int], int] = {}
+
+    def _tid(self) -> int:
+        import asyncio
+
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = (threading.get_ident(), id(task))
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids[key] = len(self._tids) + 1
+            name = threading.current_thread().name
+            if task is not None:
+                name = f"{name} / {task.get_name()}"
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+        return tid
+
+    def complete(
+        self, name: str, cat: str, start: float, end: float, args: dict[str, Any]
+    ) -> None:
+        """记录一个已结束的阶段
+
+        Args:
+            name (str): 阶段名称
+            cat (str): 阶段类别，例如 network、parse、validate、render
+            start (float): 开始时的 time.perf_counter() 读数
+            end (float): 结束时的 time.perf_counter() 读数
+            args (dict[str, Any]): 附加信息
+        """
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self.start) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": self._tid(),
+                "args": args,
+            }
+        )
+
+    def save(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.events, "displayTimeUnit": "ms"},
+                f,
+                ensure_ascii=False,
+            )
+
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(
+        self, tracer: Tracer, name: str, cat: str, args: dict[str, Any]
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.tracer.complete(
+            self.name, self.cat, self.start, time.perf_counter(), self.args
+        )
+
+
+tracer: Tracer | None = None
+"""当前的 Tracer，未开启时为 None"""
+
+
+def span(name: str, cat: str = "app", **args: Any) -> ContextManager[None]:
+    """记录 with 语句块的耗时
+
+    未开启时返回共享的空上下文，开销只有一次函数调用。
+
+    Args:
+        name (str): 阶段名称
+        cat (str): 阶段类别
+        **args: 附加信息，显示在 trace 中
+    """
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def traced(name: str, cat: str = "app") -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """记录同步函数每次调用耗时的装饰器"""
+
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with span(name, cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable(trace: Path | None, cprofile: Path | None) -> None:
+    """开启性能分析，进程退出时写入结果
+
+    Args:
+        trace (Path | None): Chrome trace 文件路径，为空时不记录各阶段耗时
+        cprofile (Path | None): cProfile 统计文件路径，为空时不启用 cProfile
+    """
+    global tracer
+    if trace is not None:
+        tracer = Tracer()
+
+    profile = None
+    if cprofile is not None:
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+
+    def save() -> None:
+        from .console import console
+
+        if profile is not None and cprofile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile)
+            console.print(f"[green]cProfile 统计已写入 [white]{cprofile}")
+        if tracer is not None and trace is not None:
+            tracer.save(trace)
+            console.print(f"[green]Trace 已写入 [white]{trace}")
+
+    if trace is not None or cprofile is not None:
+        atexit.register(save)
@@ -0,0 +1,130 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+from pydantic import BaseModel
+
+from .client import AsyncJwClient
+
+SPIN_TIME = 0.005
+
+
+class ClockOffset(BaseModel):
+    offset: float
+    """服务器时间与本地时间之差（秒）"""
+    latency: float
+    """请求到达服务器的单程延迟（秒）"""
+    uncertainty: float
+    """offset 的误差范围（秒）"""
+    probes: int
+    """实际发出的探测次数，时间不足时少于要求的次数"""
+
+
+async def calibrate(
+    client: AsyncJwClient, probes: int, stop: float | None = None
+) -> ClockOffset | None:
+    """通过探测请求估计服务器时钟偏差与单程延迟
+
+    服务器 Date 响应头只精确到秒，每次探测只能确定偏差所在的一个区间。
+    第一次探测之后，每次探测都安排在预计服务器时间跨过整秒的时刻到达，
+    根据返回的秒数判断偏差位于区间的哪一半，从而不断缩小区间，
+    最终误差受往返时间限制。单程延迟取最小往返时间的一半。
+    每次探测要等到下一个整秒，探测次数越多耗时越长；
+    给出 stop 时，下一次探测无法在 stop 前完成就提前结束，只使用已有的探测结果。
+
+    Args:
+        client (AsyncJwClient)
+        probes (int): 最多探测次数
+        stop (float | None): time.perf_counter() 时间轴上的截止时刻，为空时不限时
+
+    Returns:
+        ClockOffset | None: 估计结果，所有探测均失败或没有时间探测时返回 None
+    """
+    low, high = -math.inf, math.inf
+    min_rtt = math.inf
+    attempts = 0
+    for _ in range(probes):
+        wait = 0.0
+        if math.isfinite(low):
+            # 让请求在假定偏差下服务器时间的下一个整秒到达
+            middle = (low + high) / 2
+            latency = min_rtt / 2
+            now = time.time()
+            boundary = math.floor(now + middle + latency) + 1
+            wait = max(boundary - middle - latency - now, 0)
+        timeout = None
+        if stop is not None:
+            # 预计探测完成时已过截止时刻，不再探测
+            expected_rtt = min_rtt if math.isfinite(min_rtt) else 0
+            timeout = stop - time.perf_counter() - wait
+            if timeout <= expected_rtt:
+                break
+        await asyncio.sleep(wait)
+
+        attempts += 1
+        try:
+            sent_at, rtt, date = await asyncio.wait_for(client.probe(), timeout)
+        except TimeoutError:
+            break
+        except httpx.HTTPError:
+            continue
+        if date is None:
+            continue
+
+        server_time = parsedate_to_datetime(date).timestamp()
+        min_rtt = min(min_rtt, rtt)
+        probe_low = server_time - sent_at - rtt
+        probe_high = server_time + 1 - sent_at
+        low, high = max(low, probe_low), min(high, probe_high)
+        if low > high:
+            # 服务器或本地时钟发生跳变，以最新一次探测为准
+            low, high = probe_low, probe_high
+
+    if not math.isfinite(low):
+        return None
+    return ClockOffset(
+        offset=(low + high) / 2,
+        latency=min_rtt / 2,
+        uncertainty=(high - low) / 2,
+        probes=attempts,
+    )
+
+
+def get_deadline(target_time: datetime, clock_offset: ClockOffset | None) -> float:
+    """将服务器上的目标时间换算为本地单调时钟上的发送时刻
+
+    提前单程延迟发送，使请求恰好在目标时间到达服务器。
+    换算只在此处进行一次，之后的等待不受系统时间跳变影响。
+
+    Args:
+        target_time (datetime): 服务器上的目标时间
+        clock_offset (ClockOffset | None): 时钟偏差，为空时视为与服务器一致
+
+    Returns:
+        float: time.perf_counter() 时间轴上的发送时刻
+    """
+    fire_time = target_time.timestamp()
+    if clock_offset is not None:
+        fire_time -= clock_offset.offset + clock_offset.latency
+    return time.perf_counter() + fire_time - time.time()
+
+
+async def sleep_until(deadline: float) -> float:
+    """高精度等待至指定时刻
+
+    先使用 asyncio.sleep 粗略等待，在最后 SPIN_TIME 秒内自旋等待。
+
+    Args:
+        deadline (float): time.perf_counter() 时间轴上的时刻
+
+    Returns:
+        float: 实际唤醒时刻与 deadline 之差（秒）
+    """
+    while (remaining := deadline - time.perf_counter()) > SPIN_TIME:
+        await asyncio.sleep(remaining - SPIN_TIME)
+    while (now := time.perf_counter()) < deadline:
+        pass
+    return now - deadline
@@ -1,34 +1,54 @@
+import asyncio
+from collections.abc import Callable, Iterable, Iterator, Sized
+from contextlib import closing
+from functools import partial
+
 import typer
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 from rich.prompt import IntPrompt, Prompt
+from typing_extensions import Annotated
 
+from .cache import TIME_INFO_KEY, Cache, category_key, course_key
+from .client import JwClient
 from .config import Config, load_config
 from .console import console
-from .course import Course
-from .error import CookieExpiredError, LoadCourseError, MaxRetriesError
+from .course import Course, course_adapter, courses_adapter
+from .error import (
+    CookieExpiredError,
+    DaemonError,
+    GetCourseError,
+    LoadCourseError,
+    LoadPlanError,
+    MaxRetriesError,
+)
+from .ipc import DaemonClient, connect
+from .profiler import CProfileOption, TraceOption
+from .profiler import enable as enable_profiling
+from .plan import Plan, display_added, load_plan, resolve_plan, search_all
 from .spinning import (
     check_cookies,
     get_cookies,
     get_course_categories,
     get_time_info,
-    run_spinning,
 )
 from .time_info import TimeInfo
-from .tools import display_categories, display_course, get_courses
+from .tools import display_categories, display_course, get_courses_stream
 
 retries = 0
 app = typer.Typer()
 
+categories_adapter = TypeAdapter(list[dict[str, str]])
+time_info_adapter = TypeAdapter(TimeInfo)
 
-def select_courses(
+
+def prompt_searches(
     categories: list[dict[str, str]],
-    time_info: TimeInfo,
-    config: Config,
-    selected_courses: list[Course],
-) -> None:
-    """执行课程准备流程"""
-    global retries
-    assert config.cookies is not None
+) -> Iterator[tuple[dict[str, str], str]]:
+    """依次询问课程类别与关键词，用户退出时结束
+
+    Yields:
+        tuple[dict[str, str], str]: 课程类别与关键词
+    """
     while True:
         display_categories(categories)
         opt = IntPrompt.ask(
@@ -47,64 +67,204 @@ def select_courses(
             )
             if keyword == "q":
                 break
+            yield selected_category, keyword
 
-            get_courses_spinning = run_spinning(
-                get_courses, description=f"Searching {keyword}"
-            )
 
-            pending_courses = None
-            while retries < config.max_retries and pending_courses is None:
+def select_courses(
+    client: JwClient,
+    cache: Cache,
+    categories: list[dict[str, str]],
+    time_info: TimeInfo,
+    config: Config,
+    selected_courses: list[Course],
+) -> None:
+    """执行课程准备流程
+
+    搜索结果边下载边显示，完整下载后写入缓存，缓存未过期时不再请求服务器。
+    """
+    global retries
+    for selected_category, keyword in prompt_searches(categories):
+        key = course_key(
+            time_info.academic_year,
+            time_info.term,
+            selected_category["code"],
+            keyword,
+        )
+        done = False
+        while retries < config.max_retries and not done:
+            fetch = partial(
+                get_courses_stream,
+                client=client,
+                category=selected_category,
+                time_info=time_info,
+                keyword=keyword,
+            )
+            # 边接收边显示，用户提前退出时立即关闭连接
+            with closing(cache.stream(key, fetch, course_adapter)) as courses:
                 try:
-                    pending_courses = get_courses_spinning(
-                        category=selected_category,
-                        time_info=time_info,
-                        cookies=config.cookies,
-                        keyword=keyword,
-                    )
+                    filter_courses(courses, selected_courses)
+                    done = True
                 except CookieExpiredError:
                     get_cookies(config)
                     retries += 1
 
-            if pending_courses is None:
-                raise MaxRetriesError()
+        if not done:
+            raise MaxRetriesError()
+
+
+def search_locally(
+    queries: list[tuple[dict[str, str], str]],
+    config: Config,
+    cache: Cache,
+    time_info: TimeInfo,
+) -> list[list[Course]]:
+    """在本进程中并发执行所有搜索，Cookie 失效时重新登录后重试"""
+    global retries
+    while retries < config.max_retries:
+        try:
+            return asyncio.run(search_all(config, cache, queries, time_info))
+        except CookieExpiredError:
+            get_cookies(config)
+            retries += 1
+    raise MaxRetriesError()
+
+
+def search_with_daemon(
+    queries: list[tuple[dict[str, str], str]], daemon: DaemonClient, refresh: bool
+) -> list[list[Course]]:
+    """由守护进程并发执行所有搜索，结果保存在守护进程的内存中"""
+    results = daemon.call(
+        "courses",
+        queries=[(category["code"], keyword) for category, keyword in queries],
+        refresh=refresh,
+    )
+    return [courses_adapter.validate_python(result) for result in results]
+
+
+def select_with_daemon(
+    daemon: DaemonClient,
+    plan: Plan | None,
+    refresh: bool,
+    selected_courses: list[Course],
+) -> None:
+    """使用守护进程中已登录的会话与已获取的课程类别选择课程"""
+    categories = categories_adapter.validate_python(daemon.call("categories"))
+    search = partial(search_with_daemon, daemon=daemon, refresh=refresh)
+    if plan is not None:
+        select_from_plan(plan, categories, selected_courses, search)
+        return
+    for category, keyword in prompt_searches(categories):
+        filter_courses(search([(category, keyword)])[0], selected_courses)
+
+
+def select_from_plan(
+    plan: Plan,
+    categories: list[dict[str, str]],
+    selected_courses: list[Course],
+    search: Callable[[list[tuple[dict[str, str], str]]], list[list[Course]]],
+) -> None:
+    """按选课计划一次性添加课程，无需逐门确认
+
+    Args:
+        search (Callable): 并发执行 (课程类别, 关键词) 列表中所有搜索的函数
+    """
+    added = resolve_plan(plan, categories, selected_courses, search)
+    if added:
+        display_added(added)
+    selected_courses.extend(added)
+    console.print(
+        f"[green]已添加 [white]{len(added)} [green]门课程，"
+        f"待抢列表共 [white]{len(selected_courses)} [green]门"
+    )
 
-            filter_courses(pending_courses, selected_courses)
+
+def new_group_name(name: str, selected_courses: list[Course]) -> str:
+    """以课程名称作为分组名，与已有分组重名时加上序号"""
+    groups = {course.group for course in selected_courses}
+    group = name
+    i = 2
+    while group in groups:
+        group = f"{name}{i}"
+        i += 1
+    return group
 
 
 def filter_courses(
-    pending_courses: list[Course], selected_courses: list[Course]
+    pending_courses: Iterable[Course], selected_courses: list[Course]
 ) -> None:
     """处理用户的课程选择过程
 
     遍历课程列表，让用户对每门课程进行选择：
     - y: 添加到选课列表
+    - a: 作为上一门已选课程的备选添加，同组课程只需选上一门
     - n: 跳过当前课程
     - q: 退出选课过程
 
     Args:
-        pending_courses (list[Course]): 可选课程列表
+        pending_courses (Iterable[Course]): 可选课程，可以是边下载边产出的生成器
         selected_courses (list[Course]): 已选课程列表
     """
-    if len(pending_courses) == 0:
-        console.print("未找到课程", style="yellow")
-        return
+    if isinstance(pending_courses, Sized):
+        if len(pending_courses) == 0:
+            console.print("未找到课程", style="yellow")
+            return
+        console.print(f"[green]共找到 [white]{len(pending_courses)} [green]门课程")
 
-    console.print(f"[green]共找到 [white]{len(pending_courses)} [green]门课程")
+    count = 0
     for course in pending_courses:
+        count += 1
         display_course(course)
-        opt = Prompt.ask("是否选择该课程？", choices=["y", "n", "q"])
-        if opt == "y":
+        opt = Prompt.ask("是否选择该课程？", choices=["y", "a", "n", "q"])
+        if opt == "a" and selected_courses:
+            preferred = selected_courses[-1]
+            if preferred.group is None:
+                preferred.group = new_group_name(preferred.name, selected_courses)
+            course.group = preferred.group
+            selected_courses.append(course)
+            console.print(f"[green]已添加为 [white]{preferred.group} [green]组的备选")
+        elif opt in ("y", "a"):
             selected_courses.append(course)
             console.print("[green]已添加到待抢列表")
         elif opt == "q":
             return
 
+    if isinstance(pending_courses, Sized):
+        return
+    if count == 0:
+        console.print("未找到课程", style="yellow")
+    else:
+        console.print(f"[green]共 [white]{count} [green]门课程")
+
 
 @app.command(name="select")
-def main() -> None:
+def main(
+    refresh: Annotated[
+        bool, typer.Option("--refresh", "-r", help="忽略未过期的缓存，重新获取")
+    ] = False,
+    plan_file: Annotated[
+        str | None,
+        typer.Option(
+            "--from",
+            "-f",
+            help="按 TOML 选课计划直接添加课程，- 表示从标准输入读取",
+            show_default=False,
+        ),
+    ] = None,
+    trace: TraceOption = None,
+    cprofile: CProfileOption = None,
+) -> None:
     """
     选择课程
     """
+    enable_profiling(trace, cprofile)
+    plan = None
+    if plan_file is not None:
+        try:
+            plan = load_plan(plan_file)
+        except LoadPlanError as e:
+            console.print(f"{e}")
+            raise typer.Exit(code=1)
+
     try:
         selected_courses = Course.load()
     except ValidationError as e:
@@ -113,35 +273,68 @@ def main() -> None:
     except LoadCourseError:
         selected_courses = []
 
+    daemon = connect()
+    if daemon is not None:
+        try:
+            with daemon:
+                select_with_daemon(daemon, plan, refresh, selected_courses)
+        except (LoadPlanError, DaemonError) as e:
+            console.print(f"{e}")
+            raise typer.Exit(code=1)
+        except KeyboardInterrupt:
+            console.print("[yellow]\n正在退出...[/yellow]")
+        finally:
+            Course.save(selected_courses)
+        return
+
     config = load_config()
 
     check_cookies(config)
     assert config.cookies is not None
 
+    cache = Cache(0 if refresh else config.cache_ttl)
     global retries
     try:
-        time_info = None
-        while retries < config.max_retries and not time_info:
-            try:
-                time_info = get_time_info(config.cookies)
-            except CookieExpiredError:
-                get_cookies(config)
-                retries += 1
-        if time_info is None:
-            raise MaxRetriesError()
+        with JwClient(config) as client:
+            time_info = None
+            while retries < config.max_retries and not time_info:
+                try:
+                    time_info = cache.fetch(
+                        TIME_INFO_KEY, partial(get_time_info, client), time_info_adapter
+                    )
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if time_info is None:
+                raise MaxRetriesError()
 
-        categories = None
-        while retries < config.max_retries and categories is None:
-            try:
-                categories = get_course_categories(time_info, config.cookies)
-            except CookieExpiredError:
-                get_cookies(config)
-                retries += 1
-        if categories is None:
-            raise MaxRetriesError()
+            categories = None
+            while retries < config.max_retries and categories is None:
+                try:
+                    categories = cache.fetch(
+                        category_key(time_info.academic_year, time_info.term),
+                        partial(get_course_categories, client, time_info),
+                        categories_adapter,
+                    )
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if categories is None:
+                raise MaxRetriesError()
 
-        select_courses(categories, time_info, config, selected_courses)
+            if plan is not None:
+                search = partial(
+                    search_locally, config=config, cache=cache, time_info=time_info
+                )
+                select_from_plan(plan, categories, selected_courses, search)
+            else:
+                select_courses(
+                    client, cache, categories, time_info, config, selected_courses
+                )
 
+    except (LoadPlanError, GetCourseError) as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
     except MaxRetriesError:
         console.print("[red]尝试次数已达最大限制")
         raise typer.Exit(code=1)
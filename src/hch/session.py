@@ -0,0 +1,91 @@
+import asyncio
+import math
+import time
+from typing import Callable
+
+from .client import AsyncJwClient
+from .config import Config
+from .console import console
+from .error import BaseHunterError, CookieExpiredError, GetCookieError, GetTimeInfoError
+
+SESSION_MARGIN = 1
+
+
+async def check_session(client: AsyncJwClient) -> bool | None:
+    """用开销最小的学期信息接口检查 Cookie 是否有效
+
+    Returns:
+        bool | None: Cookie 是否有效，网络等其它错误导致无法判断时返回 None
+    """
+    try:
+        await client.post("/Xsxk/queryXkdqXnxq", GetTimeInfoError, data={"mxpylx": "1"})
+    except CookieExpiredError:
+        return False
+    except BaseHunterError:
+        return None
+    return True
+
+
+async def refresh_cookies(
+    config: Config, log: Callable[..., None] = console.print
+) -> bool:
+    """在后台线程中重新登录，不阻塞倒计时与连接保活
+
+    登录成功后立即保存新的 Cookie，其它进程或守护进程重新读取配置时不会读到旧值。
+
+    Args:
+        config (Config)
+        log (Callable[..., None]): 以 log(message, style=...) 输出信息的函数，
+            抢课时传入 hunt.log 以加上档案名前缀并转发给守护进程的客户端
+
+    Returns:
+        bool: 是否登录成功
+    """
+    from .login import get_cookies
+
+    def login() -> None:
+        get_cookies(config)
+        config.save()
+
+    try:
+        await asyncio.to_thread(login)
+    except GetCookieError as e:
+        log(f"{e}", style="red")
+        return False
+    return True
+
+
+async def keep_session(
+    client: AsyncJwClient,
+    config: Config,
+    deadline: float,
+    log: Callable[..., None] = console.print,
+) -> None:
+    """在等待开抢期间维持登录状态
+
+    每隔 session_check_interval 秒检查一次 Cookie，失效时立即重新登录，
+    同时起到保持会话活跃的作用；在目标时间前 relogin_time 秒无论是否失效都重新登录一次，
+    使开抢时的会话尽可能新。到点前 SESSION_MARGIN 秒停止，避免与选课请求争用连接。
+
+    Args:
+        client (AsyncJwClient)
+        config (Config)
+        deadline (float): time.perf_counter() 时间轴上的发送时刻
+        log (Callable[..., None]): 输出信息的函数，同 refresh_cookies
+    """
+    stop_time = deadline - SESSION_MARGIN
+    relogin_at = deadline - config.relogin_time if config.relogin_time > 0 else None
+    while time.perf_counter() < stop_time:
+        if relogin_at is not None and time.perf_counter() >= relogin_at:
+            relogin_at = None
+            await refresh_cookies(config, log)
+        elif await check_session(client) is False:
+            log("Cookie 已失效，提前重新登录", style="yellow")
+            await refresh_cookies(config, log)
+
+        wake_time = min(
+            time.perf_counter() + config.session_check_interval,
+            relogin_at if relogin_at is not None else math.inf,
+            stop_time,
+        )
+        await asyncio.sleep(max(wake_time - time.perf_counter(), 0))
@@ -6,6 +6,18 @@ from .username import app as username_app
 from .wait_time import app as wait_time_app
 from .cookies import app as cookies_app
 from .max_retries import app as max_retries_app
+from .concurrency import app as concurrency_app
+from .max_concurrency import app as max_concurrency_app
+from .rate_limit import app as rate_limit_app
+from .connections import app as connections_app
+from .prearm_time import app as prearm_time_app
+from .clock_probes import app as clock_probes_app
+from .base_url import app as base_url_app
+from .cas_url import app as cas_url_app
+from .cache_ttl import app as cache_ttl_app
+from .session_check_interval import app as session_check_interval_app
+from .relogin_time import app as relogin_time_app
+from .telemetry import app as telemetry_app
 
 app = typer.Typer(name="set", help="修改配置")
 
@@ -15,3 +27,15 @@ app.add_typer(target_time_app)
 app.add_typer(wait_time_app)
 app.add_typer(cookies_app)
 app.add_typer(max_retries_app)
+app.add_typer(concurrency_app)
+app.add_typer(max_concurrency_app)
+app.add_typer(rate_limit_app)
+app.add_typer(connections_app)
+app.add_typer(prearm_time_app)
+app.add_typer(clock_probes_app)
+app.add_typer(base_url_app)
+app.add_typer(cas_url_app)
+app.add_typer(cache_ttl_app)
+app.add_typer(session_check_interval_app)
+app.add_typer(relogin_time_app)
+app.add_typer(telemetry_app)
@@ -0,0 +1,15 @@
+import typer
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="base-url")
+def main(value: str):
+    """
+    设置教务系统地址
+    """
+    config = load_config()
+    config.base_url = value.rstrip("/")
+    config.save()
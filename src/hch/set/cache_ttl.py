@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="cache-ttl")
+def main(value: Annotated[int, typer.Argument(min=0)]):
+    """
+    设置缓存有效期（秒）
+    """
+    config = load_config()
+    config.cache_ttl = value
+    config.save()
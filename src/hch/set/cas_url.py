@@ -0,0 +1,15 @@
+import typer
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="cas-url")
+def main(value: str):
+    """
+    设置统一身份认证地址
+    """
+    config = load_config()
+    config.cas_url = value.rstrip("/")
+    config.save()
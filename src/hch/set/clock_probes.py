@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="clock-probes")
+def main(value: Annotated[int, typer.Argument(min=0)]):
+    """
+    设置时钟校准探测次数
+    """
+    config = load_config()
+    config.clock_probes = value
+    config.save()
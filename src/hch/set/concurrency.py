@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="concurrency")
+def main(value: Annotated[int, typer.Argument(min=1)]):
+    """
+    设置每个接口的初始并发请求数
+    """
+    config = load_config()
+    config.concurrency = value
+    config.save()
@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="connections")
+def main(value: Annotated[int, typer.Argument(min=1)]):
+    """
+    设置预热连接数
+    """
+    config = load_config()
+    config.connections = value
+    config.save()
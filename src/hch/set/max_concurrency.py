@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="max-concurrency")
+def main(value: Annotated[int, typer.Argument(min=1)]):
+    """
+    设置自适应并发数的上限
+    """
+    config = load_config()
+    config.max_concurrency = value
+    config.save()
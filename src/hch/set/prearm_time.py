@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="prearm-time")
+def main(value: Annotated[int, typer.Argument(min=0)]):
+    """
+    设置预热提前时间（秒）
+    """
+    config = load_config()
+    config.prearm_time = value
+    config.save()
@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="rate-limit")
+def main(value: Annotated[float, typer.Argument(min=0)]):
+    """
+    设置每个接口的初始请求速率（次/秒），0 表示不限制
+    """
+    config = load_config()
+    config.rate_limit = value
+    config.save()
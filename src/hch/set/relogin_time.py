@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="relogin-time")
+def main(value: Annotated[int, typer.Argument(min=0)]):
+    """
+    设置开抢前主动重新登录的提前时间（秒），0 表示不主动登录
+    """
+    config = load_config()
+    config.relogin_time = value
+    config.save()
@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="session-check-interval")
+def main(value: Annotated[int, typer.Argument(min=1)]):
+    """
+    设置开抢前检查 Cookie 的间隔（秒）
+    """
+    config = load_config()
+    config.session_check_interval = value
+    config.save()
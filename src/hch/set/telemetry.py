@@ -0,0 +1,16 @@
+import typer
+from typing_extensions import Annotated
+
+from ..config import load_config
+
+app = typer.Typer()
+
+
+@app.command(name="telemetry")
+def main(value: Annotated[bool, typer.Argument()]):
+    """
+    设置是否在 events.jsonl 中记录每个请求的耗时与结果
+    """
+    config = load_config()
+    config.telemetry = value
+    config.save()
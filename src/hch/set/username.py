@@ -1,5 +1,6 @@
 import typer
 
+from ..cas import clear_cas_cookies
 from ..config import load_config
 
 app = typer.Typer()
@@ -13,3 +14,5 @@ def main(value: str):
     config = load_config()
     config.username = value
     config.save()
+    # 保存的 SSO 会话属于原账号
+    clear_cas_cookies()
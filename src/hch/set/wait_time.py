@@ -9,7 +9,7 @@ app = typer.Typer()
 @app.command(name="wait-time")
 def main(value: Annotated[int, typer.Argument(min=0)]):
     """
-    设置等待时间
+    设置一轮失败后重试前的等待时间（秒）
     """
     config = load_config()
     config.wait_time = value
@@ -0,0 +1,491 @@
+import json
+import random
+import secrets
+import threading
+import time
+from base64 import b64decode
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import typer
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+from typing_extensions import Annotated
+
+from .console import console
+
+app = typer.Typer()
+
+ACADEMIC_YEAR = "2025-2026"
+CURRENT_TERM = "1"
+TERM = "2"
+CATEGORIES = [
+    ("bxk", "必修课"),
+    ("xxk", "限选课"),
+    ("tyk", "体育课"),
+    ("tsk", "通识选修课"),
+]
+COURSE_NAMES = [
+    "高等数学",
+    "线性代数",
+    "大学物理",
+    "程序设计基础",
+    "数据结构",
+    "计算机网络",
+    "操作系统",
+    "概率论与数理统计",
+    "电路原理",
+    "信号与系统",
+    "中国近现代史纲要",
+    "英语写作",
+]
+SPORTS = ["篮球", "足球", "羽毛球", "乒乓球", "网球", "游泳", "太极拳", "健美操"]
+TEACHERS = ["张伟", "王芳", "李娜", "刘洋", "陈静", "杨帆", "赵磊", "黄敏"]
+WEEKDAYS = ["一", "二", "三", "四", "五"]
+
+
+class Simulator:
+    """模拟教务系统与统一身份认证的状态
+
+    所有方法都在持有 lock 时调用。
+    """
+
+    def __init__(
+        self,
+        courses_per_category: int,
+        capacity: int,
+        open_time: float,
+        cookie_ttl: float,
+        password: str | None,
+    ) -> None:
+        self.lock = threading.Lock()
+        self.open_time = open_time
+        self.cookie_ttl = cookie_ttl
+        self.password = password
+        self.courses: dict[str, dict[str, Any]] = {}
+        self.tickets: dict[str, str] = {}
+        self.tgts: dict[str, str] = {}
+        self.sessions: dict[str, tuple[str, float]] = {}
+        self.enrolled: dict[str, dict[str, str]] = {}
+
+        rng = random.Random(0)
+        for code, _ in CATEGORIES:
+            for i in range(courses_per_category):
+                teacher = rng.choice(TEACHERS)
+                weekday = rng.choice(WEEKDAYS)
+                period = rng.choice(["1-2", "3-4", "5-6", "7-8"])
+                room = f"T{rng.randint(1, 6)}{rng.randint(101, 510)}"
+                course_id = f"{code}{i:04d}"
+                self.courses[course_id] = {
+                    "id": course_id,
+                    "code": code,
+                    "kcmc": rng.choice(COURSE_NAMES) if code != "tyk" else "体育",
+                    "tyxmmc": rng.choice(SPORTS) if code == "tyk" else "",
+                    "kcxx": (
+                        f"<div><p>教师：{teacher}</p>"
+                        f"<p>时间：周{weekday} 第{period}节</p>"
+                        f"<p>地点：{room}</p></div>"
+                    ),
+                    "zrl": capacity,
+                    "yxzrs": 0,
+                }
+
+    def is_open(self) -> bool:
+        return time.time() >= self.open_time
+
+    def login(self, username: str) -> str:
+        ticket = f"ST-{secrets.token_hex(8)}"
+        self.tickets[ticket] = username
+        return ticket
+
+    def create_session(self, ticket: str) -> str | None:
+        username = self.tickets.pop(ticket, None)
+        if username is None:
+            return None
+        session_id = secrets.token_hex(16).upper()
+        self.sessions[session_id] = (username, time.time())
+        self.enrolled.setdefault(username, {})
+        return session_id
+
+    def get_user(self, session_id: str | None) -> str | None:
+        if session_id is None or session_id not in self.sessions:
+            return None
+        username, created_at = self.sessions[session_id]
+        if self.cookie_ttl > 0 and time.time() - created_at > self.cookie_ttl:
+            del self.sessions[session_id]
+            return None
+        return username
+
+    def take_seat(self, course_id: str, username: str | None) -> str:
+        course = self.courses.get(course_id)
+        if course is None:
+            return "课程不存在"
+        if not self.is_open():
+            return "当前不在选课时间范围内"
+        if username is not None and course_id in self.enrolled[username]:
+            return "该课程已选，不能重复选课"
+        if course["yxzrs"] >= course["zrl"]:
+            return "课程容量已满"
+        course["yxzrs"] += 1
+        if username is not None:
+            self.enrolled[username][course_id] = datetime.now().strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+        return "操作成功"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    simulator: Simulator
+    latency: float = 0
+    jitter: float = 0
+    error_rate: float = 0
+    clock_skew: float = 0
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def date_time_string(self, timestamp: float | None = None) -> str:
+        if timestamp is None:
+            timestamp = time.time()
+        return super().date_time_string(timestamp + self.clock_skew)
+
+    def get_cookie(self, name: str) -> str | None:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookie[name].value if name in cookie else None
+
+    def read_form(self) -> dict[str, str]:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        if "application/json" in self.headers.get("Content-Type", ""):
+            return json.loads(body) if body else {}
+        return {key: values[0] for key, values in parse_qs(body).items()}
+
+    def send_body(
+        self,
+        body: bytes,
+        content_type: str,
+        status: int = 200,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_json(self, data: Any) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_body(body, "application/json;charset=UTF-8")
+
+    def send_html(self, html: str, headers: dict[str, str] | None = None) -> None:
+        self.send_body(html.encode("utf-8"), "text/html;charset=UTF-8", headers=headers)
+
+    def redirect(self, location: str, cookies: list[str] | None = None) -> None:
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for cookie in cookies or []:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+
+    def delay(self) -> bool:
+        """模拟网络与服务器处理延迟，按概率注入错误
+
+        Returns:
+            bool: 是否已返回错误响应
+        """
+        time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+        if random.random() < self.error_rate:
+            self.send_body("Service Unavailable".encode(), "text/plain", status=503)
+            return True
+        return False
+
+    def do_HEAD(self) -> None:
+        self.do_GET()
+
+    def do_GET(self) -> None:
+        if self.delay():
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self.simulator.lock:
+            if url.path == "/authserver/login":
+                self.cas_login_page(query)
+            elif url.path == "/casLogin":
+                self.jw_cas_login(query)
+            else:
+                self.send_html("<html><body>jw</body></html>")
+
+    def do_POST(self) -> None:
+        form = self.read_form()
+        if self.delay():
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self.simulator.lock:
+            if url.path == "/authserver/login":
+                self.cas_login(query, form)
+                return
+
+            username = self.simulator.get_user(self.get_cookie("JSESSIONID"))
+            if username is None:
+                self.send_html("<html><body>请重新登录</body></html>")
+            elif url.path == "/Xsxk/queryXkdqXnxq":
+                self.send_json(
+                    {
+                        "p_dqxn": ACADEMIC_YEAR,
+                        "p_dqxq": CURRENT_TERM,
+                        "p_xn": ACADEMIC_YEAR,
+                        "p_xq": TERM,
+                    }
+                )
+            elif url.path == "/Xsxk/queryYxkc":
+                self.query_yxkc(username, form)
+            elif url.path == "/Xsxk/queryKxrw":
+                self.query_kxrw(form)
+            elif url.path == "/Xsxk/addGouwuche":
+                message = self.simulator.take_seat(form.get("p_id", ""), username)
+                self.send_json({"code": 200, "message": message})
+            elif url.path == "/cjgl/grcjcx/grcjcx":
+                self.query_grades(username, form)
+            else:
+                self.send_body(b"Not Found", "text/plain", status=404)
+
+    def cas_login_page(self, query: dict[str, str]) -> None:
+        service = query.get("service", "")
+        tgt = self.get_cookie("CASTGC")
+        username = self.simulator.tgts.get(tgt or "")
+        if username is not None:
+            ticket = self.simulator.login(username)
+            self.redirect(f"{service}?{urlencode({'ticket': ticket})}")
+            return
+
+        salt = secrets.token_hex(8)
+        execution = secrets.token_hex(16)
+        self.send_html(
+            f"""<html><body><div id="pwdLoginDiv"><form>
+<input type="hidden" id="_eventId" value="submit">
+<input type="hidden" id="cllt" value="userNameLogin">
+<input type="hidden" id="dllt" value="generalLogin">
+<input type="hidden" id="lt" value="">
+<input type="hidden" id="pwdEncryptSalt" value="{salt}">
+<input type="hidden" id="execution" value="{execution}">
+</form></div></body></html>""",
+            headers={"Set-Cookie": f"SALT={salt}; Path=/authserver; HttpOnly"},
+        )
+
+    def cas_login(self, query: dict[str, str], form: dict[str, str]) -> None:
+        salt = self.get_cookie("SALT")
+        username = form.get("username", "")
+        if salt is None or not username or not self.check_password(form, salt):
+            self.cas_login_page(query)
+            return
+
+        tgt = f"TGT-{secrets.token_hex(16)}"
+        self.simulator.tgts[tgt] = username
+        ticket = self.simulator.login(username)
+        self.redirect(
+            f"{query.get('service', '')}?{urlencode({'ticket': ticket})}",
+            cookies=[f"CASTGC={tgt}; Path=/authserver; HttpOnly"],
+        )
+
+    def check_password(self, form: dict[str, str], salt: str) -> bool:
+        if self.simulator.password is None:
+            return True
+        try:
+            # 随机 IV 只影响第一个分组，而该分组位于 64 位随机前缀之内
+            cipher = AES.new(salt.encode(), AES.MODE_CBC, bytes(16))
+            data = unpad(cipher.decrypt(b64decode(form["password"])), AES.block_size)
+        except (KeyError, ValueError):
+            return False
+        return data[64:].decode("utf-8", errors="ignore") == self.simulator.password
+
+    def jw_cas_login(self, query: dict[str, str]) -> None:
+        session_id = self.simulator.create_session(query.get("ticket", ""))
+        if session_id is None:
+            self.send_html("<html><body>ticket 无效</body></html>")
+            return
+        self.redirect(
+            "/",
+            cookies=[
+                f"JSESSIONID={session_id}; Path=/; HttpOnly",
+                f"route={secrets.token_hex(16)}; Path=/",
+            ],
+        )
+
+    def query_yxkc(self, username: str, form: dict[str, str]) -> None:
+        if form.get("p_xkfsdm") != "yixuan":
+            self.send_json(
+                {
+                    "xkgzszList": [
+                        {"xkfsdm": code, "xkfsmc": name} for code, name in CATEGORIES
+                    ]
+                }
+            )
+            return
+
+        courses = self.simulator.courses
+        self.send_json(
+            {
+                "yxkcList": [
+                    {
+                        "id": course_id,
+                        "kcmc": courses[course_id]["kcmc"],
+                        "tyxmmc": courses[course_id]["tyxmmc"],
+                        "kcxx": courses[course_id]["kcxx"],
+                        "xkfsdm": courses[course_id]["code"],
+                        "zrl": str(courses[course_id]["zrl"]),
+                        "yxzrs": str(courses[course_id]["yxzrs"]),
+                        "xksj": hunted_time,
+                    }
+                    for course_id, hunted_time in self.simulator.enrolled[
+                        username
+                    ].items()
+                ]
+            }
+        )
+
+    def query_kxrw(self, form: dict[str, str]) -> None:
+        code = form.get("p_xkfsdm")
+        keyword = form.get("p_gjz", "")
+        elements = [
+            {
+                "id": course["id"],
+                "kcmc": course["kcmc"],
+                "tyxmmc": course["tyxmmc"],
+                "kcxx": course["kcxx"],
+                "zrl": str(course["zrl"]),
+                "yxzrs": str(course["yxzrs"]),
+            }
+            for course in self.simulator.courses.values()
+            if course["code"] == code
+            and (keyword in course["kcmc"] + course["tyxmmc"] + course["kcxx"])
+        ]
+        self.send_json({"kxrwList": {"list": elements, "total": len(elements)}})
+
+    def query_grades(self, username: str, form: dict[str, str]) -> None:
+        rng = random.Random(username)
+        grades = [
+            {
+                "zzcj": str(rng.randint(60, 100)),
+                "khfs": rng.choice(["考试", "考查"]),
+                "kcmc": f"{rng.choice(COURSE_NAMES)}（{i + 1}）",
+                "pm": str(rng.randint(1, 120)),
+                "zrs": "120",
+            }
+            for i in range(150)
+        ]
+        current = int(form.get("current", 1))
+        page_size = int(form.get("pageSize", 100))
+        start = (current - 1) * page_size
+        self.send_json(
+            {
+                "content": {
+                    "list": grades[start : start + page_size],
+                    "total": len(grades),
+                    "current": current,
+                    "pageSize": page_size,
+                },
+                "msg": "查询成功",
+            }
+        )
+
+
+def run_competitors(
+    simulator: Simulator, competitors: int, rate: float, drop_rate: float
+) -> None:
+    """模拟其他同学在选课开始后持续抢占课程余量，并不时退课
+
+    Args:
+        simulator (Simulator)
+        competitors (int): 竞争者数量
+        rate (float): 每个竞争者每秒发出的选课请求数
+        drop_rate (float): 每秒退课次数
+    """
+    interval = 0.01
+    course_ids = list(simulator.courses)
+    budget = 0.0
+    drop_budget = 0.0
+    while True:
+        time.sleep(interval)
+        with simulator.lock:
+            if not simulator.is_open():
+                continue
+            budget += competitors * rate * interval
+            while budget >= 1:
+                simulator.take_seat(random.choice(course_ids), None)
+                budget -= 1
+            drop_budget += drop_rate * interval
+            while drop_budget >= 1:
+                course = simulator.courses[random.choice(course_ids)]
+                course["yxzrs"] = max(course["yxzrs"] - 1, 0)
+                drop_budget -= 1
+
+
+@app.command(name="simulator")
+def main(
+    host: Annotated[str, typer.Option(help="监听地址")] = "127.0.0.1",
+    port: Annotated[int, typer.Option(help="监听端口")] = 8080,
+    latency: Annotated[float, typer.Option(min=0, help="平均响应延迟（毫秒）")] = 50,
+    jitter: Annotated[float, typer.Option(min=0, help="延迟抖动范围（毫秒）")] = 10,
+    open_in: Annotated[float, typer.Option(min=0, help="启动后多少秒开放选课")] = 0,
+    capacity: Annotated[int, typer.Option(min=0, help="每门课程的容量")] = 30,
+    courses: Annotated[int, typer.Option(min=1, help="每个类别的课程数")] = 50,
+    competitors: Annotated[int, typer.Option(min=0, help="模拟竞争者数量")] = 0,
+    competitor_rate: Annotated[
+        float, typer.Option(min=0, help="每个竞争者每秒的选课请求数")
+    ] = 1,
+    drop_rate: Annotated[
+        float, typer.Option(min=0, help="其他同学每秒随机退课的次数")
+    ] = 0,
+    cookie_ttl: Annotated[
+        float, typer.Option(min=0, help="Cookie 有效期（秒），0 表示不过期")
+    ] = 0,
+    error_rate: Annotated[
+        float, typer.Option(min=0, max=1, help="返回 503 错误的概率")
+    ] = 0,
+    clock_skew: Annotated[
+        float, typer.Option(help="服务器时钟相对本地时钟的偏差（秒）")
+    ] = 0,
+    password: Annotated[
+        str | None, typer.Option(help="校验登录密码，为空时接受任意密码")
+    ] = None,
+) -> None:
+    """
+    启动本地模拟教务系统
+    """
+    simulator = Simulator(
+        courses, capacity, time.time() + open_in, cookie_ttl, password
+    )
+    Handler.simulator = simulator
+    Handler.latency = latency / 1000
+    Handler.jitter = jitter / 1000
+    Handler.error_rate = error_rate
+    Handler.clock_skew = clock_skew
+
+    if competitors > 0 or drop_rate > 0:
+        threading.Thread(
+            target=run_competitors,
+            args=(simulator, competitors, competitor_rate, drop_rate),
+            daemon=True,
+        ).start()
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    url = f"http://{host}:{port}"
+    console.print(f"[green]模拟服务器已启动：[white]{url}")
+    console.print(f"[cyan]使用 [white]hch set base-url {url}")
+    console.print(f"[cyan]与 [white]hch set cas-url {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n正在退出...", style="yellow")
+    finally:
+        server.server_close()
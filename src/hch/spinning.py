@@ -3,12 +3,11 @@ from typing import Callable, ParamSpec, TypeVar
 import typer
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from .client import JwClient
 from .config import Config
 from .console import console
 from .error import GetCookieError
-from .login import get_cookies
 from .time_info import TimeInfo
-from .tools import get_course_categories
 
 T = TypeVar("T")
 P = ParamSpec("P")
@@ -29,10 +28,23 @@ def run_spinning(func: Callable[P, T], description: str) -> Callable[P, T]:
 
 
 get_time_info = run_spinning(TimeInfo.get, description="Fetching Time Info")
-get_cookies = run_spinning(get_cookies, description="Fetching Cookies")
-get_course_categories = run_spinning(
-    get_course_categories, description="Fetching Course Categories"
-)
+
+
+def get_cookies(config: Config) -> str:
+    # 登录依赖 pycryptodome 与 selectolax，只在需要时导入
+    from .login import get_cookies
+
+    return run_spinning(get_cookies, description="Fetching Cookies")(config)
+
+
+def get_course_categories(
+    client: JwClient, time_info: TimeInfo
+) -> list[dict[str, str]]:
+    from .tools import get_course_categories
+
+    return run_spinning(
+        get_course_categories, description="Fetching Course Categories"
+    )(client, time_info)
 
 
 def check_cookies(config: Config):
@@ -0,0 +1,167 @@
+import json
+import math
+from pathlib import Path
+from typing import Any
+
+import typer
+from rich.table import Table
+from typing_extensions import Annotated
+
+from .config import load_config
+from .console import console
+from .telemetry import EVENTS_FILE
+
+HUNT_PATH = "/Xsxk/addGouwuche"
+MAX_TIMELINE = 20
+
+app = typer.Typer()
+
+
+def load_events(path: Path) -> list[dict[str, Any]]:
+    """读取事件日志，先读轮转出的旧文件，跳过损坏的行"""
+    events = []
+    for file in (path.with_suffix(".jsonl.1"), path):
+        try:
+            with open(file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(event, dict) and "session" in event:
+                        events.append(event)
+        except FileNotFoundError:
+            continue
+    return events
+
+
+def group_sessions(events: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    """按会话分组，保持会话出现的先后顺序"""
+    sessions: dict[str, list[dict[str, Any]]] = {}
+    for event in events:
+        sessions.setdefault(event["session"], []).append(event)
+    return sessions
+
+
+def percentile(values: list[float], p: float) -> float:
+    """最近秩法计算百分位数，values 需已排序"""
+    return values[max(math.ceil(len(values) * p) - 1, 0)]
+
+
+def is_failed(event: dict[str, Any]) -> bool:
+    status = event.get("status")
+    return event.get("error") is not None or status is None or status >= 400
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def print_session(session_id: str, events: list[dict[str, Any]]) -> None:
+    header = next((e for e in events if e["type"] == "session"), {})
+    command = " ".join(header.get("argv", []))
+    console.print(
+        f"[cyan]会话 [white]{session_id} [dim]{header.get('time', '')}[/dim] "
+        f"[green]hch {command}"
+    )
+
+    requests = [e for e in events if e["type"] == "http"]
+    paths: dict[str, list[dict[str, Any]]] = {}
+    for event in requests:
+        paths.setdefault(event["path"], []).append(event)
+
+    table = Table()
+    table.add_column("接口", style="cyan", no_wrap=True)
+    table.add_column("请求数", justify="right")
+    table.add_column("失败", justify="right", style="red")
+    for name in ("p50", "p90", "p99", "max"):
+        table.add_column(f"{name} (ms)", justify="right", style="green")
+    for path, path_events in sorted(paths.items(), key=lambda item: -len(item[1])):
+        latencies = sorted(e["latency"] for e in path_events)
+        table.add_row(
+            path,
+            str(len(path_events)),
+            str(sum(is_failed(e) for e in path_events)),
+            format_ms(percentile(latencies, 0.5)),
+            format_ms(percentile(latencies, 0.9)),
+            format_ms(percentile(latencies, 0.99)),
+            format_ms(latencies[-1]),
+        )
+    console.print(table)
+
+    # 选课请求的时间线以目标时间为零点，没有定时的会话以会话开始为零点
+    deadline = next((e for e in events if e["type"] == "deadline"), None)
+    origin = deadline["t"] if deadline is not None else 0.0
+    hunts = sorted(
+        (e for e in requests if e["path"] == HUNT_PATH), key=lambda e: e["t"]
+    )
+    if deadline is not None:
+        console.print(f"[cyan]目标时间: [white]{deadline.get('target')}")
+        fire = next((e for e in events if e["type"] == "fire"), None)
+        if fire is not None and fire.get("firing_error") is not None:
+            console.print(
+                f"[cyan]触发误差: [white]{format_ms(fire['firing_error'])} ms"
+            )
+        if hunts:
+            console.print(
+                f"[cyan]首个选课请求发出: [white]"
+                f"{format_ms(hunts[0]['t'] - origin)} ms [dim](相对目标时间)"
+            )
+    if not hunts:
+        return
+
+    timeline = Table(title="选课请求时间线")
+    timeline.add_column("发出 (ms)", justify="right", style="cyan")
+    timeline.add_column("耗时 (ms)", justify="right", style="green")
+    timeline.add_column("状态", justify="right")
+    timeline.add_column("结果", style="magenta")
+    for event in hunts[:MAX_TIMELINE]:
+        timeline.add_row(
+            format_ms(event["t"] - origin),
+            format_ms(event["latency"]),
+            str(event.get("status") or "-"),
+            event.get("message") or event.get("error") or "",
+        )
+    console.print(timeline)
+    if len(hunts) > MAX_TIMELINE:
+        console.print(f"[dim]另有 {len(hunts) - MAX_TIMELINE} 个选课请求未显示")
+
+
+@app.command(name="stats")
+def main(
+    last: Annotated[
+        int, typer.Option("--last", "-n", min=1, help="显示最近几次运行")
+    ] = 3,
+    session: Annotated[
+        str | None,
+        typer.Option("--session", "-s", help="只显示指定会话", show_default=False),
+    ] = None,
+) -> None:
+    """
+    统计请求记录中各接口的延迟分布与选课时间线
+    """
+    config = load_config()
+    sessions = group_sessions(load_events(config.app_dir / EVENTS_FILE))
+    # 只包含请求记录的会话才有统计意义
+    sessions = {
+        session_id: events
+        for session_id, events in sessions.items()
+        if any(e["type"] == "http" for e in events)
+    }
+    if session is not None:
+        if session not in sessions:
+            console.print(f"[red]找不到会话 {session}")
+            raise typer.Exit(code=1)
+        selected = [session]
+    else:
+        selected = list(sessions)[-last:]
+
+    if not selected:
+        console.print("[yellow]没有请求记录")
+        if not config.telemetry:
+            console.print("请求记录已关闭，可通过 hch set telemetry true 开启")
+        return
+
+    for session_id in selected:
+        print_session(session_id, sessions[session_id])
+        console.print()
@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from .paths import get_app_dir
+
+DB_FILE = "hch.db"
+BUSY_TIMEOUT = 10
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS config (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS queue (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    grp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queue_grp ON queue (grp);
+
+CREATE TABLE IF NOT EXISTS hunted (
+    academic_year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    time TEXT NOT NULL,
+    PRIMARY KEY (academic_year, term, id)
+);
+
+CREATE TABLE IF NOT EXISTS catalog (
+    academic_year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    synced_time TEXT NOT NULL,
+    PRIMARY KEY (academic_year, term)
+);
+
+CREATE TABLE IF NOT EXISTS catalog_course (
+    academic_year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    information_hash TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (academic_year, term, id)
+);
+CREATE INDEX IF NOT EXISTS catalog_course_code
+    ON catalog_course (academic_year, term, code);
+
+CREATE TABLE IF NOT EXISTS catalog_token (
+    academic_year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    token TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (academic_year, term, token, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS seat_history (
+    academic_year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    id TEXT NOT NULL,
+    time REAL NOT NULL,
+    enrolled INTEGER NOT NULL,
+    capacity INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS seat_history_course
+    ON seat_history (academic_year, term, id, time);
+
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+
+class Store:
+    """档案的本地状态库
+
+    配置、待抢课程、课程目录、余量历史、选课历史与缓存都保存在档案目录下的同一个
+    SQLite 数据库中。使用 WAL 模式，多个 hch 进程可以同时读写，
+    写入冲突时等待至多 BUSY_TIMEOUT 秒。每次写入都在单个事务中完成并同步落盘。
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            # 数据库中包含密码与 Cookie，仅当前用户可读写
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+
+        if self.schema_version() < SCHEMA_VERSION:
+            with self.transaction() as connection:
+                # 其它进程可能已在等待写锁期间完成初始化
+                if self.schema_version() < SCHEMA_VERSION:
+                    # executescript 会提交当前事务，因此逐条执行
+                    for statement in SCHEMA.split(";"):
+                        connection.execute(statement)
+                    import_legacy_files(connection, path.parent)
+                    connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def schema_version(self) -> int:
+        return self.connection.execute("PRAGMA user_version").fetchone()[0]
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """开启写事务，退出时提交，出错时回滚
+
+        立即获取写锁，避免多个进程同时由读事务升级为写事务导致死锁。
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def query(self, sql: str, parameters: Any = ()) -> list[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+
+_stores: dict[Path, Store] = {}
+
+
+def get_store(app_dir: Path | None = None) -> Store:
+    """获取档案的状态库，同一进程内共用一个连接
+
+    Args:
+        app_dir (Path | None): 档案目录，为空时使用当前档案
+    """
+    if app_dir is None:
+        app_dir = get_app_dir()
+    path = app_dir / DB_FILE
+    if path not in _stores:
+        _stores[path] = Store(path)
+    return _stores[path]
+
+
+def _read_json(path: Path) -> Any:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def import_legacy_files(connection: sqlite3.Connection, app_dir: Path) -> None:
+    """导入引入状态库之前的 JSON 文件
+
+    导入 config.json、courses.json（合并 courses.journal 中已选上的课程）与缓存，
+    原文件保持不变。课程目录可由 `hch catalog sync` 重新生成，不做导入。
+    """
+    config = _read_json(app_dir / "config.json")
+    if isinstance(config, dict):
+        connection.executemany(
+            "INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in config.items()],
+        )
+
+    courses = _read_json(app_dir / "courses.json")
+    if isinstance(courses, list):
+        hunted_ids: set[str] = set()
+        hunted_groups: set[str] = set()
+        try:
+            with open(app_dir / "courses.journal", "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    hunted_ids.add(entry["id"])
+                    if entry.get("group") is not None:
+                        hunted_groups.add(entry["group"])
+        except FileNotFoundError:
+            pass
+        connection.executemany(
+            "INSERT OR IGNORE INTO queue (id, position, grp, data) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    course["id"],
+                    position,
+                    course.get("group"),
+                    json.dumps(course, ensure_ascii=False),
+                )
+                for position, course in enumerate(courses)
+                if course["id"] not in hunted_ids
+                and course.get("group") not in hunted_groups
+            ],
+        )
+
+    cache_dir = app_dir / "cache"
+    if cache_dir.is_dir():
+        for file in cache_dir.glob("*.json"):
+            entry = _read_json(file)
+            if isinstance(entry, dict) and {"key", "time", "value"} <= entry.keys():
+                connection.execute(
+                    "INSERT OR IGNORE INTO cache (key, time, value) VALUES (?, ?, ?)",
+                    (entry["key"], entry["time"], json.dumps(entry["value"])),
+                )
@@ -0,0 +1,131 @@
+import json
+import secrets
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .config import Config
+
+EVENTS_FILE = "events.jsonl"
+MAX_EVENTS_SIZE = 10 * 1024 * 1024
+
+session_id = secrets.token_hex(4)
+"""本次运行的会话 ID，同一进程内的事件共用"""
+session_start = time.perf_counter()
+"""会话开始时的单调时钟读数，事件时间均相对于此"""
+session_time = time.time()
+"""会话开始时的系统时间"""
+
+
+class EventLog:
+    """只追加的 JSONL 事件日志
+
+    每行一个事件，包含会话 ID、相对会话开始的单调时间 t（秒）与事件类型。
+    第一次写入时记录一条 session 事件，文件超过 MAX_EVENTS_SIZE 时轮转为 .1。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: IO[str] | None = None
+
+    def _open(self) -> IO[str]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size > MAX_EVENTS_SIZE:
+            self.path.replace(self.path.with_suffix(".jsonl.1"))
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._write(
+            {
+                "session": session_id,
+                "t": 0.0,
+                "type": "session",
+                "time": datetime.fromtimestamp(session_time).isoformat(),
+                "argv": sys.argv[1:],
+            }
+        )
+        return self._file
+
+    def _write(self, event: dict[str, Any]) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record(self, type: str, at: float | None = None, **fields: Any) -> None:
+        """记录一个事件
+
+        Args:
+            type (str): 事件类型
+            at (float | None): 事件发生时的 time.perf_counter() 读数，为空时取当前时间
+            **fields: 事件的其它字段
+        """
+        if self._file is None:
+            self._open()
+        if at is None:
+            at = time.perf_counter()
+        self._write(
+            {
+                "session": session_id,
+                "t": round(at - session_start, 6),
+                "type": type,
+                **fields,
+            }
+        )
+
+
+_event_logs: dict[Path, EventLog] = {}
+
+
+def get_event_log(config: "Config") -> EventLog | None:
+    """获取配置所属档案的事件日志，未启用记录时返回 None"""
+    if not config.telemetry:
+        return None
+    path = config.app_dir / EVENTS_FILE
+    if path not in _event_logs:
+        _event_logs[path] = EventLog(path)
+    return _event_logs[path]
+
+
+def record_request(
+    config: "Config",
+    method: str,
+    path: str,
+    start: float,
+    status: int | None = None,
+    message: str | None = None,
+    error: str | None = None,
+) -> None:
+    """记录一次 HTTP 请求
+
+    Args:
+        config (Config)
+        method (str): 请求方法
+        path (str): 请求路径
+        start (float): 发出请求时的 time.perf_counter() 读数
+        status (int | None): 响应状态码，未收到响应时为空
+        message (str | None): 服务器返回的消息
+        error (str | None): 请求失败时的错误
+    """
+    event_log = get_event_log(config)
+    if event_log is None:
+        return
+    event_log.record(
+        "http",
+        at=start,
+        method=method,
+        path=path,
+        latency=round(time.perf_counter() - start, 6),
+        status=status,
+        message=message,
+        error=error,
+    )
+
+
+def get_message(result: Any) -> str | None:
+    """取出接口返回的 JSON 中的消息"""
+    if isinstance(result, dict):
+        message = result.get("message", result.get("msg"))
+        if isinstance(message, str):
+            return message
+    return None
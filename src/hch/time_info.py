@@ -1,11 +1,13 @@
 from typing import Self
 
-import httpx
 from pydantic import BaseModel
 
 from .console import console
-from .error import CookieExpiredError, GetTimeInfoError
-from .login import get_headers
+from .client import AsyncJwClient, JwClient
+from .error import GetTimeInfoError
+from .profiler import traced
+
+TIME_INFO_DATA = {"mxpylx": "1"}
 
 
 class TimeInfo(BaseModel):
@@ -15,11 +17,12 @@ class TimeInfo(BaseModel):
     current_term: str
 
     @classmethod
-    def get(cls, cookies: str) -> Self:
+    @traced("TimeInfo.get")
+    def get(cls, client: JwClient) -> Self:
         """获取当前及选课学年学期信息
 
         Args:
-            cookies (str)
+            client (JwClient)
 
         Returns:
             TimeInfo
@@ -28,31 +31,30 @@ class TimeInfo(BaseModel):
             CookieExpiredError: Cookie 失效时抛出
             GetTimeInfoError: 发生其它错误时抛出
         """
-        headers = get_headers(cookies)
-        url = "http://jw.hitsz.edu.cn/Xsxk/queryXkdqXnxq"
-        data = {"mxpylx": "1"}
-        response = httpx.post(url, headers=headers, data=data, follow_redirects=True)
-        if response.status_code == 200:
-            if "application/json" in response.headers["Content-Type"]:
-                response_json = response.json()
-                try:
-                    current_academic_year = response_json["p_dqxn"]
-                    current_term = response_json["p_dqxq"]
-                    academic_year = response_json["p_xn"]
-                    term = response_json["p_xq"]
-                    console.print("[green]成功获取时间信息")
-                    return cls(
-                        current_academic_year=current_academic_year,
-                        current_term=current_term,
-                        academic_year=academic_year,
-                        term=term,
-                    )
-                except KeyError:
-                    message = response_json["message"]
-                    raise GetTimeInfoError(f"[red]时间信息获取失败：{message}")
-            elif "text/html" in response.headers["Content-Type"]:
-                raise CookieExpiredError()
-            else:
-                raise GetTimeInfoError("[red]响应内容不是有效的 JSON 格式")
-        else:
-            raise GetTimeInfoError(f"[red]请求失败，状态码：{response.status_code}")
+        response_json = client.post(
+            "/Xsxk/queryXkdqXnxq", GetTimeInfoError, data=TIME_INFO_DATA
+        )
+        time_info = cls.parse(response_json)
+        console.print("[green]成功获取时间信息")
+        return time_info
+
+    @classmethod
+    async def get_async(cls, client: AsyncJwClient) -> Self:
+        """异步获取学年学期信息，不打印提示，参数与返回值同 get"""
+        response_json = await client.post(
+            "/Xsxk/queryXkdqXnxq", GetTimeInfoError, data=TIME_INFO_DATA
+        )
+        return cls.parse(response_json)
+
+    @classmethod
+    def parse(cls, response_json: dict) -> Self:
+        try:
+            return cls(
+                current_academic_year=response_json["p_dqxn"],
+                current_term=response_json["p_dqxq"],
+                academic_year=response_json["p_xn"],
+                term=response_json["p_xq"],
+            )
+        except KeyError:
+            message = response_json["message"]
+            raise GetTimeInfoError(f"[red]时间信息获取失败：{message}")
@@ -1,14 +1,133 @@
-import httpx
+import hashlib
+import json
+from typing import Any, Iterable, Iterator
+
+from pydantic import TypeAdapter, ValidationError
 from rich.table import Table
 from selectolax.parser import HTMLParser
+from typing_extensions import TypedDict
 
 from .console import console
 from .course import Course
-from .error import CookieExpiredError, GetCourseCategoryError, GetCourseError
-from .login import get_headers
+from .client import AsyncJwClient, JwClient
+from .error import GetCourseCategoryError, GetCourseError
+from .profiler import span, traced
 from .time_info import TimeInfo
 
 
+class CourseRow(TypedDict):
+    """课程搜索接口返回的一行课程，只声明用到的字段"""
+
+    id: str
+    kcmc: str
+    tyxmmc: str
+    kcxx: str
+    zrl: int
+    yxzrs: int
+
+
+course_row_adapter = TypeAdapter(CourseRow)
+course_rows_adapter = TypeAdapter(list[CourseRow])
+JSON_SEPARATORS = " \t\n\r,"
+
+_decoder = json.JSONDecoder()
+
+
+class ArrayNotFoundError(ValueError):
+    """JSON 文本中没有找到要读取的数组，text 为完整的文本"""
+
+    def __init__(self, text: str) -> None:
+        super().__init__("array not found")
+        self.text = text
+
+
+def iter_json_array(chunks: Iterable[str], keys: list[str]) -> Iterator[Any]:
+    """从分块到达的 JSON 文本中逐个取出数组元素
+
+    依次找到 keys 中的各个键之后的第一个数组，每收到一个完整的元素就立即产出，
+    已产出的文本随即丢弃，内存占用只与单个元素的大小有关。
+    文本不完整的元素会等到后续分块到达后再解析。
+
+    Args:
+        chunks (Iterable[str]): 分块的 JSON 文本
+        keys (list[str]): 从外到内的键名，例如 ["kxrwList", "list"]
+
+    Raises:
+        ArrayNotFoundError: 整个文本中都没有找到该数组时抛出，通常是服务器返回了错误信息
+        ValueError: 数组格式错误或文本在数组结束前中断时抛出
+    """
+    patterns = [json.dumps(key) for key in keys]
+    buffer = ""
+    position = 0
+    in_array = False
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if not in_array:
+                pattern = patterns[0] if patterns else "["
+                found = buffer.find(pattern, position)
+                if found < 0:
+                    break
+                position = found + len(pattern)
+                if patterns:
+                    patterns.pop(0)
+                else:
+                    in_array = True
+                continue
+
+            while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                value, position = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # 元素尚未完整到达
+                break
+            yield value
+
+        if in_array:
+            buffer = buffer[position:]
+            position = 0
+
+    if not in_array:
+        raise ArrayNotFoundError(buffer)
+    raise ValueError("JSON 数组不完整")
+
+
+class InformationParser:
+    """课程信息解析器
+
+    按课程 id 记录原始 kcxx HTML 的哈希与解析结果，
+    内容未变化时直接复用上次的结果，无需重新解析 HTML。
+    """
+
+    def __init__(self, entries: dict[str, tuple[str, str]] | None = None) -> None:
+        self.entries = entries if entries is not None else {}
+        """课程 id 到 (kcxx 哈希, 课程信息) 的映射"""
+        self.parsed = 0
+        self.reused = 0
+
+    def parse(self, id: str, kcxx: str) -> str:
+        digest = hashlib.blake2b(kcxx.encode("utf-8"), digest_size=16).hexdigest()
+        entry = self.entries.get(id)
+        if entry is not None and entry[0] == digest:
+            self.reused += 1
+            return entry[1]
+
+        with span("HTMLParser", "parse"):
+            information = HTMLParser(kcxx).text(separator="\n").strip()
+        self.entries[id] = (digest, information)
+        self.parsed += 1
+        return information
+
+
+information_parser = InformationParser()
+"""进程内共享的解析器，重复获取同一类别时复用解析结果"""
+
+
 def display_categories(categories: list[dict[str, str]]) -> None:
     """显示可选课程类别列表
 
@@ -22,7 +141,8 @@ def display_categories(categories: list[dict[str, str]]) -> None:
     table.add_column("课程类别", style="magenta")
     for i, category in enumerate(categories):
         table.add_row(f"{i + 1}", f"{category['name']}")
-    console.print(table)
+    with span("display_categories", "render"):
+        console.print(table)
 
 
 def display_course(course: Course) -> None:
@@ -37,15 +157,19 @@ def display_course(course: Course) -> None:
         course.information,
         f"{course.enrolled}/{course.capacity}",
     )
-    console.print(table)
+    with span("display_course", "render"):
+        console.print(table)
 
 
-def get_course_categories(time_info: TimeInfo, cookies: str) -> list[dict[str, str]]:
+@traced("get_course_categories")
+def get_course_categories(
+    client: JwClient, time_info: TimeInfo
+) -> list[dict[str, str]]:
     """获取课程类别列表
 
     Args:
-        time_info (dict[str, str]): 学年学期信息字典
-        cookies (str)
+        client (JwClient)
+        time_info (TimeInfo): 学年学期信息
 
     Returns:
         list[dict[str, str]]: 课程类别列表，每个元素是包含课程类别信息的字典
@@ -54,39 +178,29 @@ def get_course_categories(time_info: TimeInfo, cookies: str) -> list[dict[str, s
         CookieExpiredError: 当 Cookie 失效时抛出
         GetCourseCategoryError: 有其它错误时抛出
     """
-    headers = get_headers(cookies)
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryYxkc"
     data = {"p_xn": time_info.academic_year, "p_xq": time_info.term}
-    response = httpx.post(url=url, headers=headers, data=data, follow_redirects=True)
-    if response.status_code == 200:
-        if "application/json" in response.headers["Content-Type"]:
-            response_json = response.json()
-            try:
-                categories = []
-                elements = response_json["xkgzszList"]
-                for element in elements:
-                    code = element["xkfsdm"]  # 获取课程类别代码
-                    name = element["xkfsmc"]  # 获取课程类别名称
-                    categories.append({"code": code, "name": name})
-
-                console.print("[green]成功获取课程类别")
-                return categories
-            except KeyError:
-                message = response_json["message"]
-                raise GetCourseCategoryError(f"[red]时间信息获取失败：{message}")
-        elif "text/html" in response.headers["Content-Type"]:
-            raise CookieExpiredError()
-        else:
-            raise GetCourseCategoryError("[red]响应内容不是有效的 JSON 格式")
-    else:
-        raise GetCourseCategoryError(f"[red]请求失败，状态码：{response.status_code}")
+    response_json = client.post("/Xsxk/queryYxkc", GetCourseCategoryError, data=data)
+    try:
+        categories = []
+        elements = response_json["xkgzszList"]
+        for element in elements:
+            code = element["xkfsdm"]  # 获取课程类别代码
+            name = element["xkfsmc"]  # 获取课程类别名称
+            categories.append({"code": code, "name": name})
+
+        console.print("[green]成功获取课程类别")
+        return categories
+    except KeyError:
+        message = response_json["message"]
+        raise GetCourseCategoryError(f"[red]时间信息获取失败：{message}")
 
 
 def get_courses(
+    client: JwClient,
     category: dict[str, str],
     time_info: TimeInfo,
-    cookies: str,
     keyword: str,
+    parser: InformationParser = information_parser,
 ) -> list[Course]:
     """根据类别和关键词搜索课程
 
@@ -94,10 +208,11 @@ def get_courses(
     如果关键词为空字符串，则返回该类别下的所有课程。
 
     Args:
+        client (JwClient)
         category (dict[str, str]): 包含课程类别代码和名称的字典
         time_info (TimeInfo): 学年学期信息字典
-        cookies (str)
         keyword (str): 搜索关键词
+        parser (InformationParser): 课程信息解析器，内容未变化的课程复用上次的解析结果
 
     Returns:
         list[Course]: 课程列表
@@ -105,9 +220,73 @@ def get_courses(
         CookieExpiredError: Cookie 失效时抛出
         GetCourseError: 课程信息获取失败时抛出
     """
-    headers = get_headers(cookies)
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryKxrw"
-    data = {
+    with span("get_courses", category=category["code"], keyword=keyword):
+        data = get_courses_data(category, time_info, keyword)
+        response_json = client.post("/Xsxk/queryKxrw", GetCourseError, data=data)
+        return parse_courses(response_json, category, time_info, parser)
+
+
+async def get_courses_async(
+    client: AsyncJwClient,
+    category: dict[str, str],
+    time_info: TimeInfo,
+    keyword: str,
+    parser: InformationParser = information_parser,
+) -> list[Course]:
+    """异步根据类别和关键词搜索课程，参数与返回值同 get_courses"""
+    with span("get_courses", category=category["code"], keyword=keyword):
+        data = get_courses_data(category, time_info, keyword)
+        response_json = await client.post("/Xsxk/queryKxrw", GetCourseError, data=data)
+        return parse_courses(response_json, category, time_info, parser)
+
+
+def get_courses_stream(
+    client: JwClient,
+    category: dict[str, str],
+    time_info: TimeInfo,
+    keyword: str,
+    parser: InformationParser = information_parser,
+) -> Iterator[Course]:
+    """边接收边解析的课程搜索，参数同 get_courses
+
+    每收到一门课程就立即解析并产出，无需等待整个类别下载完成。
+
+    Yields:
+        Course: 按服务器返回顺序产出的课程
+
+    Raises:
+        CookieExpiredError: Cookie 失效时抛出
+        GetCourseError: 课程信息获取失败时抛出
+    """
+    data = get_courses_data(category, time_info, keyword)
+    with client.stream("/Xsxk/queryKxrw", GetCourseError, data=data) as response:
+        try:
+            for element in iter_json_array(response.iter_text(), ["kxrwList", "list"]):
+                row = course_row_adapter.validate_python(element)
+                yield Course(
+                    id=row["id"],
+                    name=row["kcmc"].strip() + row["tyxmmc"].strip(),
+                    information=parser.parse(row["id"], row["kcxx"]),
+                    code=category["code"],
+                    academic_year=time_info.academic_year,
+                    term=time_info.term,
+                    capacity=row["zrl"],
+                    enrolled=row["yxzrs"],
+                )
+        except ArrayNotFoundError as e:
+            try:
+                message = json.loads(e.text).get("message")
+            except (json.JSONDecodeError, AttributeError):
+                message = None
+            raise GetCourseError(f"[red]课程信息获取失败：{message}")
+        except (ValueError, ValidationError):
+            raise GetCourseError("[red]课程信息获取失败：响应格式错误")
+
+
+def get_courses_data(
+    category: dict[str, str], time_info: TimeInfo, keyword: str
+) -> dict[str, str]:
+    return {
         "p_pylx": "1",
         "p_gjz": keyword,
         "p_xn": time_info.academic_year,
@@ -117,36 +296,44 @@ def get_courses(
         "p_xkfsdm": category["code"],
     }
 
-    response = httpx.post(url, data=data, headers=headers, follow_redirects=True)
-    if response.status_code == 200:
-        if "application/json" in response.headers["Content-Type"]:
-            response_json = response.json()
-            try:
-                elements: list[dict[str, str]] = response_json["kxrwList"]["list"]
-                courses: list[Course] = []
-                for course in elements:
-                    tree = HTMLParser(course["kcxx"])
-                    information = tree.text(separator="\n")
-                    courses.append(
-                        Course(
-                            id=course["id"],
-                            name=course["kcmc"].strip() + course["tyxmmc"].strip(),
-                            information=information.strip(),
-                            code=category["code"],
-                            academic_year=time_info.academic_year,
-                            term=time_info.term,
-                            capacity=course["zrl"],
-                            enrolled=course["yxzrs"],
-                            hunted_time=None,
-                        )
-                    )
-                return courses
-            except KeyError:
-                message = response_json["message"]
-                raise GetCourseError(f"[red]课程信息获取失败：{message}")
-        elif "text/html" in response.headers["Content-Type"]:
-            raise CookieExpiredError()
-        else:
-            raise GetCourseError("[red]响应内容不是有效的 JSON 格式")
-    else:
-        raise GetCourseError(f"[red]请求失败，状态码：{response.status_code}")
+
+def parse_courses(
+    response_json: dict,
+    category: dict[str, str],
+    time_info: TimeInfo,
+    parser: InformationParser = information_parser,
+) -> list[Course]:
+    """解析课程搜索接口的响应
+
+    Args:
+        response_json (dict)
+        category (dict[str, str]): 课程类别
+        time_info (TimeInfo): 学年学期信息
+        parser (InformationParser): 课程信息解析器
+
+    Raises:
+        GetCourseError: 响应中没有课程列表时抛出
+    """
+    try:
+        with span("CourseRow", "validate"):
+            rows = course_rows_adapter.validate_python(
+                response_json["kxrwList"]["list"]
+            )
+    except (KeyError, TypeError, ValidationError):
+        message = response_json.get("message")
+        raise GetCourseError(f"[red]课程信息获取失败：{message}")
+
+    # 整个列表已经校验过，直接构造课程
+    return [
+        Course(
+            id=row["id"],
+            name=row["kcmc"].strip() + row["tyxmmc"].strip(),
+            information=parser.parse(row["id"], row["kcxx"]),
+            code=category["code"],
+            academic_year=time_info.academic_year,
+            term=time_info.term,
+            capacity=row["zrl"],
+            enrolled=row["yxzrs"],
+        )
+        for row in rows
+    ]
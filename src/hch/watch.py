@@ -0,0 +1,304 @@
+import asyncio
+import random
+
+import typer
+from pydantic import ValidationError
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from typing_extensions import Annotated
+
+from .client import AsyncJwClient, JwClient
+from .config import Config, load_config
+from .console import console
+from .course import Course, group_courses, record_seats
+from .error import (
+    CookieExpiredError,
+    GetCourseError,
+    LoadCourseError,
+    MaxRetriesError,
+)
+from .hunt import HuntResult, hunt_group
+from .session import refresh_cookies
+from .spinning import check_cookies, get_cookies, get_time_info
+from .time_info import TimeInfo
+from .tools import get_courses_async
+
+BACKOFF_FACTOR = 1.5
+JITTER = 0.1
+
+retries = 0
+app = typer.Typer()
+
+
+class CategoryWatcher:
+    """轮询单个类别下的待抢课程，出现余量时立即选课
+
+    轮询间隔在 min_interval 与 max_interval 之间自适应调整：
+    已选人数有变化时减半，没有变化时逐渐放宽，请求出错时加倍。
+    只保存待抢课程本身，运行时间再长内存占用也不会增长。
+    """
+
+    def __init__(
+        self,
+        code: str,
+        courses: list[Course],
+        min_interval: float,
+        max_interval: float,
+    ) -> None:
+        self.category = {"code": code, "name": code}
+        self.courses = {course.id: course for course in courses}
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.failed: dict[str, tuple[int, int]] = {}
+        """选课失败时课程的 (已选人数, 容量)，余量未变化前不再重复选课"""
+
+    def adjust(self, changed: bool) -> None:
+        if changed:
+            self.interval = max(self.interval / 2, self.min_interval)
+        else:
+            self.interval = min(self.interval * BACKOFF_FACTOR, self.max_interval)
+
+    async def poll(self, client: AsyncJwClient, time_info: TimeInfo) -> list[Course]:
+        """获取一次最新余量，有变化的课程写入余量历史
+
+        Returns:
+            list[Course]: 有余量的待抢课程
+
+        Raises:
+            CookieExpiredError: Cookie 失效时抛出
+            GetCourseError: 有其它错误时抛出
+        """
+        changed: list[Course] = []
+        available: list[Course] = []
+        for latest in await get_courses_async(client, self.category, time_info, ""):
+            course = self.courses.get(latest.id)
+            if course is None:
+                continue
+            if (latest.enrolled, latest.capacity) != (course.enrolled, course.capacity):
+                changed.append(course)
+                course.enrolled = latest.enrolled
+                course.capacity = latest.capacity
+            snapshot = (course.enrolled, course.capacity)
+            if course.available:
+                if self.failed.get(course.id) != snapshot:
+                    available.append(course)
+        if changed:
+            record_seats(changed, client.config.app_dir)
+        self.adjust(bool(changed) or bool(available))
+        return available
+
+    async def sleep(self) -> None:
+        await asyncio.sleep(self.interval * random.uniform(1 - JITTER, 1 + JITTER))
+
+
+class Watcher:
+    """管理所有类别的轮询与选课"""
+
+    def __init__(
+        self,
+        client: AsyncJwClient,
+        config: Config,
+        time_info: TimeInfo,
+        pending_courses: list[Course],
+        min_interval: float,
+        max_interval: float,
+    ) -> None:
+        self.client = client
+        self.config = config
+        self.time_info = time_info
+        self.pending_courses = pending_courses
+        self.login_lock = asyncio.Lock()
+        self.polls = 0
+        self.attempts = 0
+        self.relogins = 0
+        """连续重新登录的次数，轮询成功后清零"""
+
+        categories: dict[str, list[Course]] = {}
+        for course in pending_courses:
+            categories.setdefault(course.code, []).append(course)
+        self.watchers = [
+            CategoryWatcher(code, courses, min_interval, max_interval)
+            for code, courses in categories.items()
+        ]
+
+    async def relogin(self, cookies: str | None) -> None:
+        """Cookie 失效时重新登录，多个类别同时失效时只登录一次
+
+        Raises:
+            MaxRetriesError: 连续重新登录次数达到 max_retries 时抛出
+        """
+        async with self.login_lock:
+            if self.config.cookies != cookies:
+                return
+            if self.relogins >= self.config.max_retries:
+                raise MaxRetriesError()
+            self.relogins += 1
+            console.print("Cookie 过期，尝试重新获取", style="yellow")
+            await refresh_cookies(self.config)
+
+    async def watch_category(self, watcher: CategoryWatcher) -> None:
+        while watcher.courses:
+            cookies = self.config.cookies
+            try:
+                available = await watcher.poll(self.client, self.time_info)
+            except CookieExpiredError:
+                await self.relogin(cookies)
+                await watcher.sleep()
+                continue
+            except GetCourseError as e:
+                console.print(f"{e}")
+                watcher.interval = min(watcher.interval * 2, watcher.max_interval)
+                await watcher.sleep()
+                continue
+            finally:
+                self.polls += 1
+            self.relogins = 0
+
+            if available:
+                await self.hunt(watcher, available, cookies)
+            await watcher.sleep()
+
+    def remove(self, course: Course) -> None:
+        """移除已选上的课程及其同组备选"""
+        for pending_course in list(self.pending_courses):
+            if pending_course.id == course.id or (
+                course.group is not None and pending_course.group == course.group
+            ):
+                self.pending_courses.remove(pending_course)
+                for watcher in self.watchers:
+                    watcher.courses.pop(pending_course.id, None)
+
+    async def hunt(
+        self, watcher: CategoryWatcher, courses: list[Course], cookies: str | None
+    ) -> None:
+        # 同组课程可能已在其它类别中选上
+        courses = [course for course in courses if course.id in watcher.courses]
+        for course in courses:
+            console.print(
+                f"[cyan]发现余量：[white]{course.name} "
+                f"[yellow]{course.enrolled}/{course.capacity}"
+            )
+        priorities = {course.id: i for i, course in enumerate(self.pending_courses)}
+        groups = group_courses(sorted(courses, key=lambda c: priorities[c.id]))
+        group_results = await asyncio.gather(
+            *(hunt_group(group, self.client, {}) for group in groups)
+        )
+        for group, results in zip(groups, group_results):
+            self.attempts += len(results)
+            for course, result in zip(group, results):
+                if result is HuntResult.SUCCESS:
+                    self.remove(course)
+                elif result is HuntResult.FAILED:
+                    watcher.failed[course.id] = (course.enrolled, course.capacity)
+        if any(results[-1] is HuntResult.COOKIE_EXPIRED for results in group_results):
+            await self.relogin(cookies)
+
+    async def run(self) -> None:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+            transient=True,
+        ) as progress:
+            task = progress.add_task("")
+
+            async def report() -> None:
+                while True:
+                    intervals = ", ".join(
+                        f"{watcher.category['code']} {watcher.interval:.1f}s"
+                        for watcher in self.watchers
+                        if watcher.courses
+                    )
+                    progress.update(
+                        task,
+                        description=(
+                            f"Watching: [cyan]{len(self.pending_courses)} "
+                            f"[white]门课程，已轮询 [cyan]{self.polls} "
+                            f"[white]次，选课 [cyan]{self.attempts} "
+                            f"[white]次 [dim]({intervals})"
+                        ),
+                    )
+                    await asyncio.sleep(1)
+
+            report_task = asyncio.create_task(report())
+            try:
+                await asyncio.gather(
+                    *(self.watch_category(watcher) for watcher in self.watchers)
+                )
+            finally:
+                report_task.cancel()
+
+
+async def watch(
+    pending_courses: list[Course],
+    config: Config,
+    time_info: TimeInfo,
+    min_interval: float,
+    max_interval: float,
+) -> None:
+    max_connections = max(config.concurrency, config.max_concurrency)
+    async with AsyncJwClient(config, max_connections) as client:
+        await Watcher(
+            client, config, time_info, pending_courses, min_interval, max_interval
+        ).run()
+
+
+@app.command(name="watch")
+def main(
+    min_interval: Annotated[
+        float, typer.Option(min=0.5, help="最短轮询间隔（秒）")
+    ] = 3,
+    max_interval: Annotated[
+        float, typer.Option(min=0.5, help="最长轮询间隔（秒）")
+    ] = 30,
+) -> None:
+    """
+    持续监视待抢课程余量，有空位时立即选课
+    """
+    try:
+        pending_courses = Course.load()
+    except LoadCourseError as e:
+        console.print(f"{e}")
+        raise typer.Exit(code=1)
+    except ValidationError as e:
+        console.print(e)
+        raise typer.Exit(code=1)
+
+    config = load_config()
+    check_cookies(config)
+    assert config.cookies is not None
+    global retries
+    try:
+        with JwClient(config) as client:
+            time_info = None
+            while retries < config.max_retries and not time_info:
+                try:
+                    time_info = get_time_info(client)
+                except CookieExpiredError:
+                    get_cookies(config)
+                    retries += 1
+            if time_info is None:
+                raise MaxRetriesError()
+
+        console.print(
+            f"[green]开始监视 [white]{len(pending_courses)} [green]门课程，"
+            "按 Ctrl+C 退出"
+        )
+        asyncio.run(
+            watch(
+                pending_courses,
+                config,
+                time_info,
+                min_interval,
+                max(min_interval, max_interval),
+            )
+        )
+        console.print("[green]所有课程均已选上")
+
+    except MaxRetriesError:
+        console.print("[red]尝试次数已达最大限制")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        console.print("\n退出程序", style="yellow")
+    finally:
+        config.save()